@@ -7,6 +7,7 @@ from flask_cors import CORS  # <-- import at the top
 from app.utils.helpers import setupLambdaLogger, setupLogger
 
 from .extensions import db, ma, migrate, api
+from .commands import registerCommands
 
 
 
@@ -70,6 +71,9 @@ def create_app():
     api.register_blueprint(ReportsBlueprint, url_prefix="/reports")
     api.register_blueprint(CronsBlueprint, url_prefix="/cron")
 
+    # CLI commands (flask <command>)
+    registerCommands(app)
+
 
     return app
 
@@ -0,0 +1,128 @@
+import click
+from flask.cli import with_appcontext
+
+from app.services.export_job_service import runExportWorker
+from app.services.export_service import benchmarkExportFormats
+from app.services.query_plan_service import checkQueryPlans, checkTimesheetDetailQueryCount
+from app.services.search_service import rebuildUserSearchIndex
+from app.services.timesheet_summary_service import (
+    checkTimesheetSummaries,
+    rebuildTimesheetSummaries,
+)
+from app.utils.helpers import benchmarkTokenVerification
+
+
+@click.command("rebuild-timesheet-summary")
+@with_appcontext
+@click.option("--batch-size", default=500, show_default=True, help="Timesheets per transaction.")
+def rebuildTimesheetSummaryCommand(batch_size):
+    """Rebuild the timesheet_summary read model and timesheet_entry_days from the timesheet tables."""
+    total = rebuildTimesheetSummaries(batchSize=batch_size)
+    click.echo(f"Rebuilt the summary of {total} timesheets.")
+
+
+@click.command("check-timesheet-summary")
+@with_appcontext
+def checkTimesheetSummaryCommand():
+    """Check that every timesheet has its summary row; exits with 1 if not."""
+    missing, orphans = checkTimesheetSummaries()
+
+    if missing:
+        click.echo(f"Timesheets without a summary row: {', '.join(map(str, missing))}")
+
+    if orphans:
+        click.echo(f"Summary rows without a timesheet: {', '.join(map(str, orphans))}")
+
+    if missing or orphans:
+        raise click.ClickException(
+            "The timesheet summary is out of date, run `flask rebuild-timesheet-summary`"
+        )
+
+    click.echo("The timesheet summary matches the timesheets.")
+
+
+@click.command("rebuild-search-index")
+@with_appcontext
+@click.option("--batch-size", default=1000, show_default=True, help="Users per transaction.")
+def rebuildSearchIndexCommand(batch_size):
+    """Rebuild the user name / email search index."""
+    total = rebuildUserSearchIndex(batchSize=batch_size)
+    click.echo(f"Indexed {total} users.")
+
+
+@click.command("check-query-plans")
+@with_appcontext
+def checkQueryPlansCommand():
+    """EXPLAIN the hot service queries; exits with 1 if one does a full scan."""
+    plans, regressions = checkQueryPlans()
+
+    for name, lines in plans.items():
+        click.echo(f"{'FULL SCAN' if name in regressions else 'ok':>9}  {name}")
+
+        for line in lines:
+            click.echo(f"           {line}")
+
+    if regressions:
+        raise click.ClickException(f"{len(regressions)} hot queries fall back to a full scan")
+
+
+@click.command("check-timesheet-query-count")
+@with_appcontext
+def checkTimesheetQueryCountCommand():
+    """Check that loading a timesheet runs as many statements whatever its number of entries."""
+    counts = checkTimesheetDetailQueryCount()
+
+    for entryCount, statementCount in counts.items():
+        click.echo(f"{entryCount:>4} entries  {statementCount:>4} statements")
+
+    if len(set(counts.values())) > 1:
+        raise click.ClickException("The statement count of getTimesheetByCode grows with its entries")
+
+
+@click.command("run-export-worker")
+@with_appcontext
+@click.option("--once", is_flag=True, help="Exit when the queue is empty instead of polling.")
+@click.option("--max-jobs", type=int, default=None, help="Exit after running this many jobs.")
+def runExportWorkerCommand(once, max_jobs):
+    """Run the queued timesheet export jobs."""
+    processed = runExportWorker(once=once, maxJobs=max_jobs)
+    click.echo(f"Ran {processed} export jobs.")
+
+
+@click.command("benchmark-exports")
+@with_appcontext
+@click.option("--rows", default=100000, show_default=True, help="Synthetic timesheet rows per format.")
+def benchmarkExportsCommand(rows):
+    """Compare the throughput of the xlsx, csv and parquet timesheet exports."""
+    for name, result in benchmarkExportFormats(rows).items():
+        if "error" in result:
+            click.echo(f"{name:>8}  skipped: {result['error']}")
+            continue
+
+        click.echo(
+            f"{name:>8}  {result['seconds']:>8.3f} s  {result['rows_per_second']:>10} rows/s"
+            f"  {result['bytes'] / 1024:>10.1f} KiB"
+        )
+
+
+@click.command("benchmark-token-cache")
+@with_appcontext
+@click.option("--iterations", default=10000, show_default=True, help="Verifications per run.")
+def benchmarkTokenCacheCommand(iterations):
+    """Compare access token verification with and without the verified token cache."""
+    for name, result in benchmarkTokenVerification(iterations).items():
+        click.echo(
+            f"{name:>8}  {result['seconds']:>8.3f} s  {result['per_second']:>10} /s"
+            f"  {result['microseconds']:>8.2f} us each"
+        )
+
+
+def registerCommands(app):
+    app.cli.add_command(rebuildTimesheetSummaryCommand)
+    app.cli.add_command(checkTimesheetSummaryCommand)
+    app.cli.add_command(rebuildSearchIndexCommand)
+    app.cli.add_command(checkQueryPlansCommand)
+    app.cli.add_command(checkTimesheetQueryCountCommand)
+    app.cli.add_command(runExportWorkerCommand)
+    app.cli.add_command(benchmarkExportsCommand)
+    app.cli.add_command(benchmarkTokenCacheCommand)
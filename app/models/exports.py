@@ -0,0 +1,57 @@
+import enum
+import uuid
+
+from sqlalchemy import JSON, func
+
+from app.extensions import db
+
+
+class ExportJobStatus(enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+# ---------------------------
+# Export Job
+# ---------------------------
+class ExportJob(db.Model):
+    """
+    A timesheet export requested through the API and run by the export
+    worker (app.services.export_job_service); the file is kept in the blob
+    store under result_key.
+    """
+    __tablename__ = 'export_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    code = db.Column(db.String(36), unique=True, nullable=False, default=lambda: str(uuid.uuid4()))
+
+    org_id = db.Column(db.Integer, db.ForeignKey('organizations.id'), nullable=False)
+    requested_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+
+    status = db.Column(
+        db.Enum(ExportJobStatus, name="export_job_status_enum"),
+        nullable=False,
+        default=ExportJobStatus.QUEUED
+    )
+
+    # Role of the requester and the dumped SearchTimesheetSchema filters
+    params = db.Column(JSON, nullable=False)
+
+    rows_written = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    total_rows = db.Column(db.Integer, nullable=True)
+
+    result_key = db.Column(db.String(255), nullable=True)
+    error = db.Column(db.Text, nullable=True)
+
+    created_at = db.Column(db.DateTime, server_default=func.now(), nullable=False)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    # Set on every progress report; a running job that stops reporting is considered dead
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_export_jobs_status_org', 'status', 'org_id'),
+    )
@@ -49,3 +49,7 @@ class Project(db.Model):
     created_by_user = db.relationship('User', back_populates='created_projects', foreign_keys=[created_by])
     updated_by_user = db.relationship('User', back_populates='updated_projects', foreign_keys=[updated_by])
 
+    __table_args__ = (
+        db.Index('ix_projects_manager', 'manager_id'),
+    )
+
@@ -43,6 +43,10 @@ class Holiday(db.Model):
     created_at = db.Column(db.DateTime, server_default=func.now(), nullable=False)
     updated_at = db.Column(db.DateTime, server_default=func.now(), server_onupdate=func.now(), nullable=False)
 
+    __table_args__ = (
+        db.Index('ix_holidays_org_date', 'org_id', 'date'),
+    )
+
 
 # ---------------------------
 # Timesheet Status
@@ -76,6 +80,10 @@ class Timesheet(db.Model):
     week_end = db.Column(db.Date, nullable=False)
 
     status = db.Column(db.Integer, db.ForeignKey('timesheet_status.id'), nullable=False)
+
+    # Bumped by every write to the timesheet or its entries (ETag of the details API)
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
     created_at = db.Column(db.DateTime, server_default=func.now(), nullable=False)
     updated_at = db.Column(db.DateTime, server_default=func.now(), server_onupdate=func.now(), nullable=False)
 
@@ -89,6 +97,7 @@ class Timesheet(db.Model):
 
     __table_args__ = (
         db.UniqueConstraint('user_id', 'week_start', 'week_end', name='uq_user_week'),
+        db.Index('ix_timesheets_week_start_user', 'week_start', 'user_id'),
     )
 
 
@@ -104,6 +113,7 @@ class TimesheetEntry(db.Model):
     approver_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
 
     hours = db.Column(db.Float, nullable=False)
+    # Hours and notes of the week in the compact format of app.utils.time_records
     time_records = db.Column(JSON, nullable=False)
     status = db.Column(db.Integer, db.ForeignKey('timesheet_status.id'), nullable=False)
 
@@ -118,9 +128,76 @@ class TimesheetEntry(db.Model):
 
     history = db.relationship('TimesheetHistory', back_populates='timesheet_entry')
 
+    __table_args__ = (
+        db.Index('ix_timesheet_entries_timesheet_project_status', 'timesheet_id', 'project_id', 'status'),
+        db.Index('ix_timesheet_entries_project_timesheet', 'project_id', 'timesheet_id'),
+    )
+
 
 
 
+# ---------------------------
+# Timesheet Summary (read model)
+# ---------------------------
+class TimesheetSummary(db.Model):
+    """
+    One row per timesheet with everything the timesheet lists show, kept in
+    sync by app.services.timesheet_summary_service in the same transaction
+    as the writes it summarizes.
+    """
+    __tablename__ = 'timesheet_summary'
+
+    timesheet_id = db.Column(db.Integer, db.ForeignKey('timesheets.id'), primary_key=True, autoincrement=False)
+    code = db.Column(db.String(36), unique=True, nullable=False)
+    org_id = db.Column(db.Integer, db.ForeignKey('organizations.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_name = db.Column(db.String(200))
+
+    week_start = db.Column(db.Date, nullable=False)
+    week_end = db.Column(db.Date, nullable=False)
+    status = db.Column(db.Integer, db.ForeignKey('timesheet_status.id'), nullable=False)
+    total_hours = db.Column(db.Float, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_timesheet_summary_org_week', 'org_id', 'week_start'),
+        db.Index('ix_timesheet_summary_user_week', 'user_id', 'week_start'),
+        db.Index('ix_timesheet_summary_week', 'week_start', 'week_end'),
+    )
+
+
+class TimesheetSummaryProject(db.Model):
+    """Hours of a timesheet per project, for the project / manager filtered lists."""
+    __tablename__ = 'timesheet_summary_projects'
+
+    timesheet_id = db.Column(db.Integer, db.ForeignKey('timesheets.id'), primary_key=True, autoincrement=False)
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), primary_key=True, autoincrement=False)
+    hours = db.Column(db.Float, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_timesheet_summary_projects_project', 'project_id', 'timesheet_id'),
+    )
+
+
+class TimesheetEntryDay(db.Model):
+    """
+    The days with hours or a note of every entry's time_records, rewritten
+    with the JSON in the same transaction (app.services.timesheet_summary_service)
+    so per-day questions are answered by the database.
+    """
+    __tablename__ = 'timesheet_entry_days'
+
+    entry_id = db.Column(db.Integer, db.ForeignKey('timesheet_entries.id', ondelete='CASCADE'), primary_key=True, autoincrement=False)
+    date = db.Column(db.Date, primary_key=True)
+    timesheet_id = db.Column(db.Integer, db.ForeignKey('timesheets.id', ondelete='CASCADE'), nullable=False)
+    hours = db.Column(db.Float, nullable=False, default=0)
+    note = db.Column(db.Text)
+
+    __table_args__ = (
+        db.Index('ix_timesheet_entry_days_date', 'date', 'timesheet_id'),
+        db.Index('ix_timesheet_entry_days_timesheet', 'timesheet_id'),
+    )
+
+
 # ---------------------------
 # Timesheet History
 # ---------------------------
@@ -142,6 +219,10 @@ class TimesheetHistory(db.Model):
     new_status_obj = db.relationship('TimesheetStatus', foreign_keys=[new_status], back_populates='history_new')
     changed_by_user = db.relationship('User', back_populates='changed_timesheets')
 
+    __table_args__ = (
+        db.Index('ix_timesheet_history_entry', 'timesheet_entry_id'),
+    )
+
 
 class TimesheetReminder(db.Model):
     __tablename__ = 'timesheet_reminders'
@@ -154,3 +235,7 @@ class TimesheetReminder(db.Model):
     sent_at = db.Column(db.DateTime, server_default=func.now(), nullable=False)
 
     timesheet = db.relationship('Timesheet', back_populates='reminders')
+
+    __table_args__ = (
+        db.Index('ix_timesheet_reminders_timesheet_type', 'timesheet_id', 'reminder_type'),
+    )
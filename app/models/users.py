@@ -2,6 +2,7 @@
 import uuid
 
 from sqlalchemy import func
+from sqlalchemy.dialects import mysql
 from app.extensions import db
 
 
@@ -15,6 +16,9 @@ class Organization(db.Model):
     description = db.Column(db.Text)
     is_active = db.Column(db.Boolean, default=True)
 
+    # Bumped by every timesheet write in the organization (ETag of the timesheet lists)
+    timesheet_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
     created_at = db.Column(db.DateTime, server_default=func.now(), nullable=False)
     updated_at = db.Column(db.DateTime, server_default=func.now(), server_onupdate=func.now(), nullable=False)
 
@@ -54,6 +58,9 @@ class User(db.Model):
     password = db.Column(db.String(200), nullable=False)
     is_active = db.Column(db.Boolean, default=True)
 
+    # Bumped whenever role/org/is_active changes; tokens carrying an older value are rejected
+    authz_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
     created_at = db.Column(db.DateTime, server_default=func.now(), nullable=False)
     updated_at = db.Column(db.DateTime, server_default=func.now(), server_onupdate=func.now(), nullable=False)
 
@@ -69,6 +76,10 @@ class User(db.Model):
     created_projects = db.relationship('Project', back_populates='created_by_user', foreign_keys='Project.created_by', lazy=True)
     updated_projects = db.relationship('Project', back_populates='updated_by_user', foreign_keys='Project.updated_by', lazy=True)
 
+    __table_args__ = (
+        db.Index('ix_users_org_role', 'org_id', 'role_id'),
+    )
+
     # Get a user's manager
     # user = User.query.get(5)
     # print(user.manager.full_name)
@@ -108,6 +119,29 @@ class UserProject(db.Model):
     created_at = db.Column(db.DateTime, server_default=func.now(), nullable=False)
     updated_at = db.Column(db.DateTime, server_default=func.now(), server_onupdate=func.now(), nullable=False)
 
+    __table_args__ = (
+        db.Index('ix_user_project_user_project', 'user_id', 'project_id'),
+    )
+
+
+class UserSearchGram(db.Model):
+    """
+    1, 2 and 3 character substrings of a user's name and email (lower case,
+    accents removed), maintained by app.services.search_service.
+    """
+    __tablename__ = 'user_search_grams'
+
+    # Binary collation on MySQL, so 'e' and 'é' are distinct keys
+    gram = db.Column(
+        db.String(3).with_variant(mysql.VARCHAR(3, collation='utf8mb4_bin'), 'mysql'),
+        primary_key=True,
+    )
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True, autoincrement=False)
+
+    __table_args__ = (
+        db.Index('ix_user_search_grams_user', 'user_id'),
+    )
+
 
 # class TimeEntry(db.Model):
 #     __tablename__ = 'time_entries'
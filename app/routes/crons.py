@@ -3,6 +3,7 @@ from flask.views import MethodView
 from flask_smorest import Blueprint
 
 from app.services.cron_service import sendEmailsToDraftTimesheets, sendSecondReminderToDraftTimesheets
+from app.services.export_job_service import runExportWorker
 from app.utils.helpers import getErrorMessage, getSuccessMessage
 
 
@@ -50,4 +51,21 @@ class SecondReminder(MethodView):
 			)
 
 		except Exception as e:
-			return getErrorMessage(str(e)), 500
\ No newline at end of file
+			return getErrorMessage(str(e)), 500
+
+
+@blp.route("/export-jobs")
+class RunExportJobs(MethodView):
+	@blp.doc(description="Run the next queued export job (the scheduled event app.scheduled.runExportJobs does the same)")
+	def get(self):
+		try:
+			# One job per call: a request is bound by the API Gateway timeout
+			processed = runExportWorker(once=True, maxJobs=1)
+
+			return getSuccessMessage(
+				"Export jobs processed successfully.",
+				{"processed": processed},
+			)
+
+		except Exception as e:
+			return getErrorMessage(str(e)), 500
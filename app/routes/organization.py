@@ -28,7 +28,10 @@ class GetOrganizationList(MethodView):
         try:
 
             orgData, error = getOrganization(
-                page=requestObj["page"], per_page=requestObj["per_page"]
+                page=requestObj["page"],
+                per_page=requestObj["per_page"],
+                pagination=requestObj["pagination"],
+                cursor=requestObj.get("cursor"),
             )
 
             if error:
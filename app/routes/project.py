@@ -1,7 +1,7 @@
 
 from flask.views import MethodView
 from flask_smorest import Blueprint
-from app.schemas.project_schema import GetTasksSchema, ProjectCreationSchema, ProjectDetailsSchema, TaskCreationSchema
+from app.schemas.project_schema import GetProjectsSchema, GetTasksSchema, ProjectCreationSchema, ProjectDetailsSchema, TaskCreationSchema
 from app.services.project_service import createProject, createTask, getProjectDetails, getProjects, getTasks, updateProject
 from app.utils.helpers import authorize, getErrorMessage, getSuccessMessage, tokenValidation
 
@@ -15,13 +15,14 @@ blp = Blueprint(
 @blp.route("/search")
 class GetProjectList(MethodView):
 
+	@blp.arguments(GetProjectsSchema, location="query")
 	@tokenValidation
 	@authorize(['Super Admin', 'HR', 'Manager'])
 
-	def get(self):
+	def get(self, requestObj):
 		try:
 
-			projects, error = getProjects(self.orgId)
+			projects, error = getProjects(self.orgId, requestObj.get("selected_fields"))
 
 			if error:
 				return getErrorMessage(error), 400
@@ -6,6 +6,7 @@ from app.schemas.timesheet_schema import (
 	BulkReviewTimesheetSchema,
 	CreateTimesheetEntrySchema,
 	DeleteTimesheetEntrySchema,
+	ExportJobSchema,
 	GetTimesheetSchema,
 	HolidayCreationSchema,
 	HolidayListSchema,
@@ -13,6 +14,14 @@ from app.schemas.timesheet_schema import (
 	SearchTimesheetSchema,
 	UpdateTimesheetsSchema,
 )
+from app.services.export_cache_service import getCachedExport
+from app.services.export_job_service import (
+	cancelExportJob,
+	createExportJob,
+	getExportJob,
+	getExportJobResult,
+)
+from app.services.export_service import EXPORT_FORMATS
 from app.services.timesheet_service import (
 	bulkReviewTimesheet,
 	copyTimesheetEntry,
@@ -20,19 +29,26 @@ from app.services.timesheet_service import (
 	createTimesheetEntry,
 	createTimesheetsForAllUsers,
 	deleteTimesheetEntry,
-	downloadTimesheets,
 	getAllTimesheets,
 	getHolidays,
 	getTimesheetByCode,
+	getTimesheetListVersion,
+	getTimesheetNavigation,
+	getTimesheetVersion,
 	getUserTimesheets,
 	reviewTimesheet,
 	updateTimesheets,
 )
 from app.utils.helpers import (
 	authorize,
+	computeETag,
 	getErrorMessage,
 	getSuccessMessage,
+	notModified,
+	sendDownload,
+	streamSuccessMessage,
 	tokenValidation,
+	withETag,
 )
 
 blp = Blueprint(
@@ -97,6 +113,19 @@ class GetTimesheets(MethodView):
 	def post(self, timesheetData):
 		try:
 
+			etag = computeETag(
+				"timesheet-search",
+				getTimesheetListVersion(self.orgId, self.userRole),
+				self.orgId,
+				self.userId,
+				self.userRole,
+				timesheetData,
+			)
+			response = notModified(etag)
+
+			if response is not None:
+				return response
+
 			timesheets, error = getAllTimesheets(
 				self.orgId,
 				self.userId,
@@ -104,14 +133,25 @@ class GetTimesheets(MethodView):
 				timesheetData,
 				page=timesheetData["page"],
 				per_page=timesheetData["per_page"],
+				download=timesheetData["stream"],
+				stream=timesheetData["stream"],
 			)
 
 			if error:
 				return getErrorMessage(error), 400
 
-			return getSuccessMessage(
-				"Timesheet list fetched successfully",
-				timesheets,
+			if timesheetData["stream"]:
+				return withETag(
+					streamSuccessMessage("Timesheet list fetched successfully", timesheets),
+					etag,
+				)
+
+			return withETag(
+				getSuccessMessage(
+					"Timesheet list fetched successfully",
+					timesheets,
+				),
+				etag,
 			)
 
 		except Exception as e:
@@ -127,15 +167,24 @@ class DownloadTimesheets(MethodView):
 	def post(self, timesheetData):
 		try:
 
-			output, error = downloadTimesheets(
+			output, error = getCachedExport(
 				self.orgId, self.userId, self.userRole, timesheetData
 			)
 
-			encoded = base64.b64encode(output.getvalue()).decode('utf-8')
-
 			if error:
 				return getErrorMessage(error), 400
 
+			mimetype, extension = EXPORT_FORMATS[timesheetData["format"]]
+
+			if timesheetData["delivery"] == "file":
+				return sendDownload(output, f"timesheets.{extension}", mimetype)
+
+			if hasattr(output, "read"):
+				with output:
+					encoded = base64.b64encode(output.read()).decode('utf-8')
+			else:
+				encoded = base64.b64encode(b"".join(output)).decode('utf-8')
+
 			return getSuccessMessage(
 				"File created successfully",
 				encoded,
@@ -145,6 +194,86 @@ class DownloadTimesheets(MethodView):
 			return getErrorMessage(str(e)), 500
 
 
+@blp.route("/export-job/create")
+class CreateExportJob(MethodView):
+	@blp.doc(description="Queue an export of the timesheet list, run in the background")
+	@blp.arguments(SearchTimesheetSchema)
+	@tokenValidation
+	@authorize(["ALL"])
+	def post(self, timesheetData):
+		try:
+			job, error = createExportJob(
+				self.orgId, self.userId, self.userRole, timesheetData
+			)
+
+			if error:
+				return getErrorMessage(error), 400
+
+			return getSuccessMessage("Export job queued successfully", job)
+
+		except Exception as e:
+			return getErrorMessage(str(e)), 500
+
+
+@blp.route("/export-job/status")
+class GetExportJob(MethodView):
+	@blp.doc(description="Status and progress of an export job")
+	@blp.arguments(ExportJobSchema)
+	@tokenValidation
+	@authorize(["ALL"])
+	def post(self, jobData):
+		try:
+			job, error = getExportJob(self.userId, jobData["job_code"])
+
+			if error:
+				return getErrorMessage(error), 400
+
+			return getSuccessMessage("Export job fetched successfully", job)
+
+		except Exception as e:
+			return getErrorMessage(str(e)), 500
+
+
+@blp.route("/export-job/cancel")
+class CancelExportJob(MethodView):
+	@blp.doc(description="Cancel a queued or running export job")
+	@blp.arguments(ExportJobSchema)
+	@tokenValidation
+	@authorize(["ALL"])
+	def post(self, jobData):
+		try:
+			job, error = cancelExportJob(self.userId, jobData["job_code"])
+
+			if error:
+				return getErrorMessage(error), 400
+
+			return getSuccessMessage("Export job cancelled successfully", job)
+
+		except Exception as e:
+			return getErrorMessage(str(e)), 500
+
+
+@blp.route("/export-job/download")
+class DownloadExportJob(MethodView):
+	@blp.doc(description="Download the file of a finished export job")
+	@blp.arguments(ExportJobSchema)
+	@tokenValidation
+	@authorize(["ALL"])
+	def post(self, jobData):
+		try:
+			result, error = getExportJobResult(self.userId, jobData["job_code"])
+
+			if error:
+				return getErrorMessage(error), 400
+
+			output, filename, mimetype = result
+
+			return sendDownload(output, filename, mimetype)
+
+		except Exception as e:
+			return getErrorMessage(str(e)), 500
+
+
 @blp.route("/user/search")
 class GetUserTimesheets(MethodView):
 
@@ -155,6 +284,18 @@ class GetUserTimesheets(MethodView):
 	def post(self, timesheetData):
 		try:
 
+			etag = computeETag(
+				"timesheet-user-search",
+				getTimesheetListVersion(self.orgId, self.userRole),
+				self.orgId,
+				self.userId,
+				timesheetData,
+			)
+			response = notModified(etag)
+
+			if response is not None:
+				return response
+
 			timesheets, error = getUserTimesheets(
 				self.orgId,
 				self.userId,
@@ -167,9 +308,12 @@ class GetUserTimesheets(MethodView):
 			if error:
 				return getErrorMessage(error), 400
 
-			return getSuccessMessage(
-				"Timesheet list fetched successfully",
-				timesheets,
+			return withETag(
+				getSuccessMessage(
+					"Timesheet list fetched successfully",
+					timesheets,
+				),
+				etag,
 			)
 
 		except Exception as e:
@@ -190,22 +334,44 @@ class GetTimesheet(MethodView):
 				if "timesheet_code" in timesheetData
 				else None
 			)
+
+			navigation = getTimesheetNavigation(timesheetCode) if timesheetCode else None
+			etag = None
+
+			if navigation is not None:
+				etag = computeETag(
+					"timesheet-details",
+					getTimesheetVersion(navigation),
+					self.orgId,
+					self.userId,
+					self.userRole,
+					timesheetData,
+				)
+				response = notModified(etag)
+
+				if response is not None:
+					return response
+
 			timesheet, error = getTimesheetByCode(
 				self.userId,
 				self.orgId,
 				timesheetCode,
 				self.userRole,
 				timesheetData["action"],
+				prefetchNeighbours=timesheetData["prefetch_neighbours"],
+				navigation=navigation,
 			)
 
 			if error:
 				return getErrorMessage(error), 400
 
-			return getSuccessMessage(
+			response = getSuccessMessage(
 				"Timesheet fetched successfully",
 				timesheet,
 			)
 
+			return withETag(response, etag) if etag else response
+
 		except Exception as e:
 			return getErrorMessage(str(e)), 500
 
@@ -292,7 +458,7 @@ class UpdateTimesheet(MethodView):
 	def put(self, timesheetData):
 		try:
 			timesheet, error = updateTimesheets(
-				self.userId, timesheetData, self.userRole
+				self.userId, self.orgId, timesheetData, self.userRole
 			)
 
 			if error:
@@ -22,10 +22,12 @@ from app.services.user_service import (
     resetUserPassword,
     userLogin,
 )
+from app.utils.cache import getCacheStats
 from app.utils.helpers import (
     authorize,
     getErrorMessage,
     getSuccessMessage,
+    streamSuccessMessage,
     tokenValidation,
 )
 
@@ -130,12 +132,17 @@ class GetUserList(MethodView):
 
         try:
             usersData, error = getUsers(
-                requestObj.get("variant", "all"), search = requestObj.get("search", ""), page=requestObj["page"], per_page=requestObj["per_page"]
+                requestObj.get("variant", "all"), search = requestObj.get("search", ""), page=requestObj["page"], per_page=requestObj["per_page"],
+                pagination=requestObj["pagination"], cursor=requestObj.get("cursor"),
+                selectedFields=requestObj.get("selected_fields"), stream=requestObj["stream"]
             )
 
             if error:
                 return getErrorMessage(error), 400
 
+            if requestObj["stream"] and requestObj.get("variant", "all") == "all":
+                return streamSuccessMessage("Users list fetched successfully", usersData)
+
             return getSuccessMessage(
                 "Users list fetched successfully",
                 usersData,
@@ -238,3 +245,20 @@ class Lookup(MethodView):
         except Exception as e:
             return getErrorMessage(str(e)), 500
 
+
+@blp.route("/cache-stats")
+class CacheStats(MethodView):
+
+    @blp.doc(description="Hit/miss counters of the in-process caches")
+    @tokenValidation
+    @authorize([ROLES["SUPER_ADMIN"]])
+    def get(self):
+
+        try:
+            return getSuccessMessage(
+                "Cache stats fetched successfully",
+                getCacheStats(),
+            )
+
+        except Exception as e:
+            return getErrorMessage(str(e)), 500
@@ -0,0 +1,15 @@
+"""
+Entry points of the Zappa scheduled events (see "events" in zappa_settings.json).
+
+They run outside of an API Gateway request, so only the Lambda timeout
+(timeout_seconds) bounds them.
+"""
+
+from app import app
+from app.services.export_job_service import runExportWorker
+
+
+def runExportJobs(event, context):
+    """Run the next queued export job, if any."""
+    with app.app_context():
+        return runExportWorker(once=True, maxJobs=1)
@@ -10,8 +10,10 @@ class OrgLoginSchema(Schema):
 
 
 class GetOrgSchema(Schema):
-    page=fields.Integer()
-    per_page=fields.Integer()
+    page=fields.Integer(load_default=1)
+    per_page=fields.Integer(load_default=10)
+    pagination=fields.Str(load_default="offset", validate=validate.OneOf(["offset", "cursor"]))
+    cursor=fields.Str(allow_none=True)
 
 class OrgResponseSchema(Schema):
     id = fields.Int()
@@ -1,6 +1,9 @@
 
 from marshmallow import Schema, fields, validate
 
+class GetProjectsSchema(Schema):
+    selected_fields = fields.Str(data_key="fields")
+
 class ProjectDetailsSchema(Schema):
     project_code = fields.Str(required=True)
 
@@ -1,7 +1,13 @@
 
+from importlib.util import find_spec
+
 from marshmallow import Schema, fields, validate
 
 
+# parquet needs the optional pyarrow package (requirements-parquet.txt)
+EXPORT_FORMAT_CHOICES = ["xlsx", "csv"] + (["parquet"] if find_spec("pyarrow") else [])
+
+
 class HolidayListSchema(Schema):
     year = fields.Str(required=True)
 
@@ -12,8 +18,20 @@ class HolidayCreationSchema(Schema):
 
 
 class SearchTimesheetSchema(Schema):
-    page = fields.Integer()
-    per_page = fields.Integer()
+    page = fields.Integer(load_default=1)
+    per_page = fields.Integer(load_default=10)
+    pagination = fields.Str(validate=validate.OneOf(["offset", "cursor"]))
+    cursor = fields.Str(allow_none=True)
+    include_total = fields.Bool(load_default=True)
+    selected_fields = fields.Str(data_key="fields")
+    # Every matching row, unpaginated, as a streamed JSON array
+    stream = fields.Bool(load_default=False)
+    # /download only: "file" returns the binary file instead of base64 in JSON
+    delivery = fields.Str(load_default="base64", validate=validate.OneOf(["base64", "file"]))
+    # Exports only: styled xlsx, or the raw data as csv / parquet
+    format = fields.Str(load_default="xlsx", validate=validate.OneOf(EXPORT_FORMAT_CHOICES))
+    # csv / parquet only: one row per timesheet, or per entry and day
+    detail = fields.Str(load_default="timesheet", validate=validate.OneOf(["timesheet", "day"]))
     sort_by = fields.Str()
     sort_direction = fields.Str()
     search = fields.Str()
@@ -30,9 +48,15 @@ class SearchTimesheetSchema(Schema):
 #     task_code = fields.Str()
 
 
+class ExportJobSchema(Schema):
+    job_code = fields.Str(required=True)
+
+
 class GetTimesheetSchema(Schema):
     timesheet_code = fields.Str()
     action = fields.Str()
+    # Include the entries and history of the previous / next week as well
+    prefetch_neighbours = fields.Bool(load_default=False)
 
 
 class CreateTimesheetEntrySchema(Schema):
@@ -48,7 +72,8 @@ class DeleteTimesheetEntrySchema(Schema):
 class TimeRecordSchema(Schema):
     # date = fields.Date(required=True)
     date = fields.Str(required=True)
-    hours = fields.Float(required=True, validate=validate.Range(min=0))
+    # A day patch: hours / note left out keep their stored value
+    hours = fields.Float(validate=validate.Range(min=0))
     note = fields.Str(allow_none=True)
 
 
@@ -22,6 +22,11 @@ class UserLoginSchema(Schema):
 class GetUsersSchema(Schema):
     page=fields.Integer(load_default=1)
     per_page=fields.Integer(load_default=10)
+    pagination=fields.Str(load_default="offset", validate=validate.OneOf(["offset", "cursor"]))
+    cursor=fields.Str(allow_none=True)
+    selected_fields=fields.Str(data_key="fields")
+    # variant "all" only: the users as a streamed JSON array
+    stream=fields.Bool(load_default=False)
     sort_by=fields.Str()
     sort_direction=fields.Str()
     variant=fields.Str()
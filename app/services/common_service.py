@@ -1,5 +1,56 @@
+import os
+
 from sqlalchemy.exc import SQLAlchemyError
 
+from app.extensions import db
+from app.utils.cache import LRUCache
+
+
+# (table name, code) -> id. Codes are immutable UUIDs, so entries only leave by LRU eviction
+codeIdCache = LRUCache("code_id", maxsize=int(os.getenv("CODE_ID_CACHE_SIZE", "20000")))
+
+# Upper bound on the number of codes sent in a single IN clause
+CODE_BATCH_SIZE = 1000
+
+
+def getIdsFromCodes(model, codes):
+    """
+    Resolve many codes of a model to their IDs.
+    Cached codes cost nothing, the rest are fetched with a single IN query.
+
+    :param model: SQLAlchemy model class (e.g., User, Project)
+    :param codes: Iterable of unique codes
+    :return: Tuple (ids, missing, error). ids maps code -> id, missing lists the codes
+             that do not exist, error is None if success.
+    """
+    try:
+        ids = {}
+        pending = []
+
+        for code in dict.fromkeys(codes):
+            cachedId = codeIdCache.get((model.__tablename__, code))
+
+            if cachedId is not None:
+                ids[code] = cachedId
+            elif code:
+                pending.append(code)
+
+        for start in range(0, len(pending), CODE_BATCH_SIZE):
+            batch = pending[start:start + CODE_BATCH_SIZE]
+            rows = db.session.query(model.code, model.id).filter(model.code.in_(batch)).all()
+
+            for row in rows:
+                ids[row.code] = row.id
+                codeIdCache.set((model.__tablename__, row.code), row.id)
+
+        missing = [code for code in dict.fromkeys(codes) if code not in ids]
+
+        return ids, missing, None
+
+    except SQLAlchemyError as e:
+        return {}, [], str(e)
+
+
 def getIdFromCode(model, code):
     """
     Fetch the ID of a record from the database using its unique code.
@@ -8,11 +59,12 @@ def getIdFromCode(model, code):
     :param code: The unique code of the record
     :return: Tuple (id, error). id is None if not found, error is None if success.
     """
-    try:
-        record = model.query.filter_by(code=code).first()
-        if not record:
-            return None, f"{model.__name__} with code '{code}' not found."
-        return record.id, None
-    
-    except SQLAlchemyError as e:
-        return None, str(e)
+    ids, missing, error = getIdsFromCodes(model, [code])
+
+    if error:
+        return None, error
+
+    if missing:
+        return None, f"{model.__name__} with code '{code}' not found."
+
+    return ids[code], None
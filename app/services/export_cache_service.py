@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import tempfile
+
+from flask import current_app
+
+from app.constants.lookups import ROLES
+from app.services.export_service import EXPORT_FORMATS, EXPORT_SPOOL_MAX_SIZE, exportTimesheets
+from app.services.timesheet_service import getTimesheetListVersion
+from app.utils.blob_store import getBlobStore
+
+
+# Total size of the cached exports; the least recently used ones are removed past it
+EXPORT_CACHE_MAX_BYTES = int(os.getenv("EXPORT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# Blob store prefix of the cached exports
+EXPORT_CACHE_PREFIX = "export-cache"
+
+
+def exportCacheKey(orgId, userId, role, timesheetData, version):
+    """
+    Blob key of an export: a hash of everything the file depends on, the
+    normalized filters and the data version of the timesheet lists. Any
+    write to a timesheet of the organization bumps the version, so an
+    outdated export is never found again and ages out of the cache.
+    """
+    exportFormat = timesheetData.get("format") or "xlsx"
+    filters = {
+        "version": version,
+        "org_id": None if role == ROLES["SUPER_ADMIN"] else orgId,
+        "role": role,
+        "user_id": userId if role in (ROLES["MANAGER"], ROLES["EMPLOYEE"]) else None,
+        "start_date": str(timesheetData["start_date"] or ""),
+        "end_date": str(timesheetData["end_date"] or ""),
+        "timesheet_status": sorted(set(timesheetData["timesheet_status"] or [])),
+        "projects": sorted(set(timesheetData["projects"] or [])),
+        "search": timesheetData.get("search") or "",
+        "user_code": timesheetData.get("user_code") or "",
+        "sort_by": timesheetData.get("sort_by") or "",
+        "sort_direction": (timesheetData.get("sort_direction") or "asc").lower(),
+        "format": exportFormat,
+        "detail": timesheetData.get("detail") or "timesheet",
+    }
+    digest = hashlib.sha256(
+        json.dumps(filters, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    _, extension = EXPORT_FORMATS[exportFormat]
+
+    return f"{EXPORT_CACHE_PREFIX}/{digest}.{extension}"
+
+
+def evictExportCache(store, maxBytes=EXPORT_CACHE_MAX_BYTES):
+    """
+    Remove the least recently used exports until the cache fits in maxBytes.
+
+    Returns:
+        int: Number of exports removed.
+    """
+    blobs = sorted(store.listBlobs(EXPORT_CACHE_PREFIX), key=lambda blob: blob[2])
+    total = sum(size for _, size, _ in blobs)
+    removed = 0
+
+    for key, size, _ in blobs:
+        if total <= maxBytes:
+            break
+
+        store.delete(key)
+        total -= size
+        removed += 1
+
+    return removed
+
+
+def _storeExport(store, key, fileobj):
+    # A cache that cannot be written must not fail the export itself
+    try:
+        store.put(key, fileobj)
+        evictExportCache(store)
+    except OSError as e:
+        current_app.logger.warning(f"Export cache write failed for {key}: {e}")
+
+
+def _cacheChunks(store, key, chunks):
+    """Pass the chunks through, and cache them once all have been produced."""
+    with tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_SIZE) as spool:
+        for chunk in chunks:
+            spool.write(chunk)
+            yield chunk
+
+        spool.seek(0)
+        _storeExport(store, key, spool)
+
+
+def getCachedExport(orgId, userId, role, timesheetData, onProgress=None):
+    """
+    exportTimesheets, served from the export cache when the same export of
+    the same data version was generated before; the only query of a hit is
+    the data version lookup.
+
+    Returns:
+        (content, error): as exportTimesheets; a hit is a binary file object.
+    """
+    try:
+        store = getBlobStore()
+        key = exportCacheKey(
+            orgId, userId, role, timesheetData, getTimesheetListVersion(orgId, role)
+        )
+
+        try:
+            cached = store.open(key)
+        except KeyError:
+            cached = None
+
+        if cached is not None:
+            store.touch(key)
+            return cached, None
+
+    except Exception as e:
+        return None, str(e)
+
+    content, error = exportTimesheets(orgId, userId, role, timesheetData, onProgress)
+
+    if error:
+        return None, error
+
+    if hasattr(content, "read"):
+        _storeExport(store, key, content)
+        content.seek(0)
+
+        return content, None
+
+    return _cacheChunks(store, key, content), None
@@ -0,0 +1,346 @@
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select, update
+
+from app.extensions import db
+from app.models.exports import ExportJob, ExportJobStatus
+from app.schemas.timesheet_schema import SearchTimesheetSchema
+from app.services.export_cache_service import getCachedExport
+from app.services.export_service import EXPORT_FORMATS, EXPORT_SPOOL_MAX_SIZE
+from app.services.timesheet_service import countTimesheetDays, getAllTimesheets
+from app.utils.blob_store import getBlobStore
+from app.utils.helpers import formatDatetime
+
+
+# Export jobs of one organization running at the same time
+EXPORT_MAX_RUNNING_PER_ORG = int(os.getenv("EXPORT_MAX_RUNNING_PER_ORG", "2"))
+
+# Seconds without a progress report after which a running job is considered dead
+EXPORT_JOB_TIMEOUT = int(os.getenv("EXPORT_JOB_TIMEOUT", "1800"))
+
+# Seconds the worker sleeps when the queue is empty
+EXPORT_WORKER_POLL_INTERVAL = float(os.getenv("EXPORT_WORKER_POLL_INTERVAL", "2"))
+
+ACTIVE_EXPORT_JOB_STATUSES = (ExportJobStatus.QUEUED, ExportJobStatus.RUNNING)
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def _jobData(job):
+    progress = None
+
+    if job.status == ExportJobStatus.SUCCEEDED:
+        progress = 100
+    elif job.total_rows:
+        progress = min(99, job.rows_written * 100 // job.total_rows)
+
+    return {
+        "job_code": job.code,
+        "status": job.status.value,
+        "rows_written": job.rows_written,
+        "total_rows": job.total_rows,
+        "progress": progress,
+        "error": job.error,
+        "created_at": formatDatetime(job.created_at, "%d/%m/%Y %I:%M %p"),
+        "started_at": formatDatetime(job.started_at, "%d/%m/%Y %I:%M %p"),
+        "finished_at": formatDatetime(job.finished_at, "%d/%m/%Y %I:%M %p"),
+    }
+
+
+def _getUserJob(userId, jobCode):
+    return ExportJob.query.filter_by(code=jobCode, requested_by=userId).first()
+
+
+def createExportJob(orgId, userId, role, timesheetData):
+    """
+    Queue an export of the timesheet list matching timesheetData; it is run
+    by the export worker (runExportWorker).
+    """
+    try:
+        job = ExportJob(
+            org_id=orgId,
+            requested_by=userId,
+            status=ExportJobStatus.QUEUED,
+            params={
+                "role": role,
+                "filters": SearchTimesheetSchema().dump(timesheetData),
+            },
+        )
+        db.session.add(job)
+        db.session.commit()
+
+        return _jobData(job), None
+
+    except Exception as e:
+        db.session.rollback()
+        return None, str(e)
+
+
+def getExportJob(userId, jobCode):
+    try:
+        job = _getUserJob(userId, jobCode)
+
+        if not job:
+            return None, "Export job does not exist"
+
+        return _jobData(job), None
+
+    except Exception as e:
+        return None, str(e)
+
+
+def cancelExportJob(userId, jobCode):
+    """
+    Cancel a queued or running job. A running export stops at its next
+    progress report.
+    """
+    try:
+        job = _getUserJob(userId, jobCode)
+
+        if not job:
+            return None, "Export job does not exist"
+
+        result = db.session.execute(
+            update(ExportJob)
+            .where(
+                ExportJob.id == job.id,
+                ExportJob.status.in_(ACTIVE_EXPORT_JOB_STATUSES),
+            )
+            .values(status=ExportJobStatus.CANCELLED, finished_at=datetime.utcnow())
+        )
+        db.session.commit()
+
+        if result.rowcount == 0:
+            db.session.refresh(job)
+            return None, f"Export job is already {job.status.value}"
+
+        db.session.refresh(job)
+
+        return _jobData(job), None
+
+    except Exception as e:
+        db.session.rollback()
+        return None, str(e)
+
+
+def getExportJobResult(userId, jobCode):
+    """
+    Returns:
+        ((binary file object, file name, mimetype), error): The caller closes the file.
+    """
+    try:
+        job = _getUserJob(userId, jobCode)
+
+        if not job:
+            return None, "Export job does not exist"
+
+        if job.status != ExportJobStatus.SUCCEEDED:
+            return None, f"Export job is {job.status.value}"
+
+        mimetype, extension = EXPORT_FORMATS[job.params["filters"].get("format") or "xlsx"]
+
+        return (getBlobStore().open(job.result_key), f"timesheets.{extension}", mimetype), None
+
+    except KeyError:
+        return None, "Export file is no longer available"
+    except Exception as e:
+        return None, str(e)
+
+
+def _failStaleJobs():
+    db.session.execute(
+        update(ExportJob)
+        .where(
+            ExportJob.status == ExportJobStatus.RUNNING,
+            ExportJob.heartbeat_at < datetime.utcnow() - timedelta(seconds=EXPORT_JOB_TIMEOUT),
+        )
+        .values(
+            status=ExportJobStatus.FAILED,
+            error="The export worker stopped responding",
+            finished_at=datetime.utcnow(),
+        )
+    )
+    db.session.commit()
+
+
+def claimNextExportJob():
+    """
+    Mark the oldest queued job of an organization below its
+    EXPORT_MAX_RUNNING_PER_ORG limit as running, and return it (or None).
+
+    The claim itself is atomic (conditional UPDATE), so a job never runs
+    twice; the per-org limit is checked just before it, so concurrent
+    workers can briefly exceed it by one job each.
+    """
+    running = dict(
+        db.session.execute(
+            select(ExportJob.org_id, func.count(ExportJob.id))
+            .where(ExportJob.status == ExportJobStatus.RUNNING)
+            .group_by(ExportJob.org_id)
+        ).all()
+    )
+
+    candidates = db.session.execute(
+        select(ExportJob.id, ExportJob.org_id)
+        .where(ExportJob.status == ExportJobStatus.QUEUED)
+        .order_by(ExportJob.id)
+        .limit(100)
+    ).all()
+
+    for jobId, orgId in candidates:
+        if running.get(orgId, 0) >= EXPORT_MAX_RUNNING_PER_ORG:
+            continue
+
+        now = datetime.utcnow()
+        result = db.session.execute(
+            update(ExportJob)
+            .where(ExportJob.id == jobId, ExportJob.status == ExportJobStatus.QUEUED)
+            .values(status=ExportJobStatus.RUNNING, started_at=now, heartbeat_at=now)
+        )
+        db.session.commit()
+
+        if result.rowcount == 1:
+            return db.session.get(ExportJob, jobId)
+
+    return None
+
+
+def _finishJob(jobId, **values):
+    """Set the final state of a job unless it was cancelled meanwhile."""
+    result = db.session.execute(
+        update(ExportJob)
+        .where(ExportJob.id == jobId, ExportJob.status == ExportJobStatus.RUNNING)
+        .values(finished_at=datetime.utcnow(), **values)
+    )
+    db.session.commit()
+
+    return result.rowcount == 1
+
+
+def runExportJob(job):
+    """Run a claimed job and store its file in the blob store."""
+    jobId = job.id
+    orgId = job.org_id
+    userId = job.requested_by
+    role = job.params["role"]
+    _, extension = EXPORT_FORMATS[job.params["filters"].get("format") or "xlsx"]
+    resultKey = f"exports/{orgId}/{job.code}.{extension}"
+
+    try:
+        filters = SearchTimesheetSchema().load(job.params["filters"])
+
+        # Rows of the file: one per entry and day for the per-day exports
+        if filters.get("detail") == "day":
+            totalRows, error = countTimesheetDays(orgId, userId, role, filters)
+        else:
+            counted, error = getAllTimesheets(
+                orgId,
+                userId,
+                role,
+                dict(filters, pagination="offset", include_total=True),
+                page=1,
+                per_page=1,
+            )
+            totalRows = counted["meta"]["total"] if counted else None
+
+        if error:
+            _finishJob(jobId, status=ExportJobStatus.FAILED, error=error)
+            return
+
+        db.session.execute(
+            update(ExportJob)
+            .where(ExportJob.id == jobId)
+            .values(total_rows=totalRows)
+        )
+        db.session.commit()
+
+        # Rows reported by the export; stays None when the file comes from the export cache
+        progress = {"rows_written": None}
+
+        def onProgress(rowsWritten):
+            progress["rows_written"] = rowsWritten
+
+            # Own connection: the session's one is busy streaming the export rows
+            with db.engine.begin() as connection:
+                result = connection.execute(
+                    update(ExportJob.__table__)
+                    .where(
+                        ExportJob.__table__.c.id == jobId,
+                        ExportJob.__table__.c.status == ExportJobStatus.RUNNING.name,
+                    )
+                    .values(rows_written=rowsWritten, heartbeat_at=datetime.utcnow())
+                )
+
+            if result.rowcount == 0:
+                raise ExportCancelled()
+
+        output, error = getCachedExport(orgId, userId, role, filters, onProgress=onProgress)
+
+        if not error and not hasattr(output, "read"):
+            # Streamed format: collect the chunks, spilling to disk past EXPORT_SPOOL_MAX_SIZE
+            chunks = output
+            output = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_SIZE)
+
+            for chunk in chunks:
+                output.write(chunk)
+
+            output.seek(0)
+
+        db.session.rollback()
+
+        if error:
+            _finishJob(jobId, status=ExportJobStatus.FAILED, error=error)
+            return
+
+        with output:
+            getBlobStore().put(resultKey, output)
+
+        finished = _finishJob(
+            jobId,
+            status=ExportJobStatus.SUCCEEDED,
+            result_key=resultKey,
+            rows_written=(
+                totalRows if progress["rows_written"] is None else progress["rows_written"]
+            ),
+        )
+
+        if not finished:
+            getBlobStore().delete(resultKey)
+
+    except Exception as e:
+        db.session.rollback()
+        _finishJob(jobId, status=ExportJobStatus.FAILED, error=str(e))
+
+
+def runExportWorker(once=False, maxJobs=None, pollInterval=EXPORT_WORKER_POLL_INTERVAL):
+    """
+    Run queued export jobs one at a time. With once=True it returns when the
+    queue is empty, otherwise it polls forever.
+
+    Returns:
+        int: Number of jobs run.
+    """
+    processed = 0
+
+    while maxJobs is None or processed < maxJobs:
+        _failStaleJobs()
+        job = claimNextExportJob()
+
+        if job is None:
+            if once:
+                break
+
+            time.sleep(pollInterval)
+            continue
+
+        runExportJob(job)
+        processed += 1
+        db.session.expire_all()
+
+    return processed
+
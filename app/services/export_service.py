@@ -0,0 +1,507 @@
+import csv
+import io
+import os
+import tempfile
+import time
+from collections import namedtuple
+from datetime import date, timedelta
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+
+from app.services.lookup_service import timesheetStatuses
+from app.services.timesheet_service import (
+    TIMESHEET_LIST_FIELDS,
+    getAllTimesheets,
+    getTimesheetDayBatches,
+    getTimesheetRowBatches,
+)
+from app.utils.helpers import STREAM_BATCH_SIZE, formatDatetime
+
+
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# format -> (mimetype, file extension)
+EXPORT_FORMATS = {
+    "xlsx": (XLSX_MIMETYPE, "xlsx"),
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+# Columns of the CSV / Parquet exports, in file order
+TIMESHEET_DATA_COLUMNS = [
+    "timesheet_code",
+    "user_name",
+    "week_start",
+    "week_end",
+    "timesheet_status",
+    "total_hours",
+]
+
+# Columns of the per-day (detail="day") exports, in file order
+DAY_DATA_COLUMNS = [
+    "timesheet_code",
+    "user_name",
+    "date",
+    "project",
+    "task",
+    "hours",
+    "note",
+    "entry_status",
+]
+
+# Columns holding a timesheet status id, written as the status name
+STATUS_COLUMNS = {"timesheet_status", "entry_status"}
+
+# Exports are kept in memory up to this size (bytes), larger ones spill to a temporary file
+EXPORT_SPOOL_MAX_SIZE = int(os.getenv("EXPORT_SPOOL_MAX_SIZE", str(8 * 1024 * 1024)))
+
+# Rows between two progress reports of an export
+EXPORT_PROGRESS_INTERVAL = int(os.getenv("EXPORT_PROGRESS_INTERVAL", "1000"))
+
+STELLAR_BLUE = "4F81BD"
+LIGHT_BLUE = "DAE3F3"
+BORDER_COLOR = "000000"
+
+# (header, width) of the timesheet export columns
+TIMESHEET_EXPORT_COLUMNS = [
+    ("User Name", 25),
+    ("Period", 30),
+    ("Status", 15),
+    ("Total Hours", 12),
+]
+
+# Fields of the timesheet list the export reads
+TIMESHEET_EXPORT_FIELDS = "user_name,week_start,week_end,timesheet_status,total_hours"
+
+
+def _thinBorder():
+    side = Side(style="thin", color=BORDER_COLOR)
+    return Border(left=side, right=side, top=side, bottom=side)
+
+
+def _solidFill(color):
+    return PatternFill(start_color=color, end_color=color, fill_type="solid")
+
+
+def _addExportStyles(wb):
+    """
+    Register the named styles of the export on the workbook. Cells then only
+    reference a style by name instead of carrying their own font / fill /
+    border / alignment objects.
+    """
+    styles = [
+        NamedStyle(
+            name="export_title",
+            font=Font(bold=True, size=16, color="FFFFFF"),
+            fill=_solidFill(STELLAR_BLUE),
+            alignment=Alignment(horizontal="center", vertical="center"),
+        ),
+        NamedStyle(
+            name="export_period",
+            font=Font(bold=True, size=12),
+            alignment=Alignment(horizontal="center", vertical="center"),
+        ),
+        NamedStyle(
+            name="export_header",
+            font=Font(bold=True, color="FFFFFF", size=11),
+            fill=_solidFill(STELLAR_BLUE),
+            border=_thinBorder(),
+            alignment=Alignment(horizontal="center", vertical="center", wrap_text=True),
+        ),
+    ]
+
+    # Rows alternate white / light blue; the user name is left aligned
+    for suffix, color in (("", "FFFFFF"), ("_alt", LIGHT_BLUE)):
+        for horizontal in ("left", "center"):
+            styles.append(
+                NamedStyle(
+                    name=f"export_row{suffix}_{horizontal}",
+                    fill=_solidFill(color),
+                    border=_thinBorder(),
+                    alignment=Alignment(horizontal=horizontal, vertical="center"),
+                )
+            )
+
+    for style in styles:
+        wb.add_named_style(style)
+
+
+def _styledCell(ws, value, style):
+    cell = WriteOnlyCell(ws, value=value)
+    cell.style = style
+    return cell
+
+
+def writeTimesheetWorkbook(output, rows, startDate, endDate):
+    """
+    Write the timesheet export to output (a path or binary file object) with a
+    write-only workbook: rows are serialized as they are consumed, so memory
+    does not grow with the number of rows.
+
+    Column widths are fixed, write-only sheets need them before the first
+    row is written.
+
+    Returns:
+        int: Number of timesheet rows written.
+    """
+    wb = Workbook(write_only=True)
+    _addExportStyles(wb)
+
+    ws = wb.create_sheet("Timesheets")
+
+    for index, (_, width) in enumerate(TIMESHEET_EXPORT_COLUMNS):
+        ws.column_dimensions[chr(ord("A") + index)].width = width
+
+    lastColumn = chr(ord("A") + len(TIMESHEET_EXPORT_COLUMNS) - 1)
+    ws.merged_cells.add(f"A1:{lastColumn}1")
+    ws.merged_cells.add(f"A2:{lastColumn}2")
+    ws.row_dimensions[1].height = 30
+    ws.row_dimensions[2].height = 25
+    ws.row_dimensions[3].height = 25
+
+    periodText = (
+        f"Period: {formatDatetime(startDate, '%b %d, %Y')} - "
+        f"{formatDatetime(endDate, '%b %d, %Y')}"
+    )
+
+    ws.append([_styledCell(ws, "Stellar IT", "export_title")])
+    ws.append([_styledCell(ws, periodText, "export_period")])
+    ws.append(
+        [_styledCell(ws, header, "export_header") for header, _ in TIMESHEET_EXPORT_COLUMNS]
+    )
+
+    count = 0
+
+    for count, ts in enumerate(rows, 1):
+        suffix = "" if count % 2 else "_alt"
+
+        ws.append(
+            [
+                _styledCell(ws, ts.get("user_name", ""), f"export_row{suffix}_left"),
+                _styledCell(
+                    ws,
+                    f"{ts.get('week_start', '')} - {ts.get('week_end', '')}",
+                    f"export_row{suffix}_center",
+                ),
+                _styledCell(ws, ts.get("timesheet_status", ""), f"export_row{suffix}_center"),
+                _styledCell(ws, ts.get("total_hours", ""), f"export_row{suffix}_center"),
+            ]
+        )
+
+    wb.save(output)
+
+    return count
+
+
+def _reportProgress(rows, onProgress):
+    count = 0
+
+    for count, row in enumerate(rows, 1):
+        yield row
+
+        if count % EXPORT_PROGRESS_INTERVAL == 0:
+            onProgress(count)
+
+    onProgress(count)
+
+
+def _timesheetColumns(batch):
+    """Columns of a batch of timesheet list rows (getTimesheetRowBatches)."""
+    return dict(zip(TIMESHEET_DATA_COLUMNS, zip(*batch)))
+
+
+def _dayColumns(batch):
+    """Columns of a batch of day rows (getTimesheetDayBatches)."""
+    return {
+        "timesheet_code": [row.code for row in batch],
+        "user_name": [row.user_name for row in batch],
+        "date": [row.date for row in batch],
+        "project": [row.project_name for row in batch],
+        "task": [row.task_name for row in batch],
+        "hours": [row.hours for row in batch],
+        "note": [row.note or "" for row in batch],
+        "entry_status": [row.status for row in batch],
+    }
+
+
+def _csvChunks(columnBatches, columnNames, statuses, onProgress=None):
+    """UTF-8 CSV, one chunk per batch of columns."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columnNames)
+
+    count = 0
+
+    for columns in columnBatches:
+        values = [
+            [statuses.nameOf(statusId) for statusId in columns[name]]
+            if name in STATUS_COLUMNS
+            else columns[name]
+            for name in columnNames
+        ]
+        writer.writerows(zip(*values))
+
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+
+        count += len(values[0])
+
+        if onProgress:
+            onProgress(count)
+
+    # Header only, when nothing matched
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _parquetSchema(pa, columnNames):
+    types = {
+        "timesheet_code": pa.string(),
+        "user_name": pa.string(),
+        "week_start": pa.date32(),
+        "week_end": pa.date32(),
+        "date": pa.date32(),
+        "project": pa.string(),
+        "task": pa.string(),
+        "hours": pa.float64(),
+        "note": pa.string(),
+        "total_hours": pa.float64(),
+    }
+
+    return pa.schema(
+        [
+            (name, pa.dictionary(pa.int32(), pa.string()) if name in STATUS_COLUMNS else types[name])
+            for name in columnNames
+        ]
+    )
+
+
+def _writeParquet(output, columnBatches, columnNames, statuses, onProgress=None):
+    """
+    Write one Arrow record batch per batch of columns. Status columns are
+    dictionary encoded against the status names instead of being looked up
+    per row.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise Exception("The parquet export requires the pyarrow package (requirements-parquet.txt)")
+
+    # Index = status id
+    statusNames = pa.array(
+        [statuses.nameOf(statusId) or "" for statusId in range(max(statuses.byId, default=0) + 1)],
+        pa.string(),
+    )
+    schema = _parquetSchema(pa, columnNames)
+    count = 0
+
+    with pq.ParquetWriter(output, schema) as writer:
+        for columns in columnBatches:
+            rowCount = len(columns[columnNames[0]])
+
+            if not rowCount:
+                continue
+
+            writer.write_batch(
+                pa.record_batch(
+                    [
+                        pa.DictionaryArray.from_arrays(pa.array(columns[name], pa.int32()), statusNames)
+                        if name in STATUS_COLUMNS
+                        else pa.array(columns[name], schema.field(name).type)
+                        for name in columnNames
+                    ],
+                    schema=schema,
+                )
+            )
+
+            count += rowCount
+
+            if onProgress:
+                onProgress(count)
+
+    return count
+
+
+def downloadTimesheets(orgId, userId, role, timesheetData, onProgress=None):
+    """
+    Build the XLSX export of the timesheet list matching timesheetData.
+
+    The rows are read from the database in batches (yield_per) and written
+    to the workbook as they arrive. The file is built in memory and moves to
+    a temporary file once it outgrows EXPORT_SPOOL_MAX_SIZE.
+
+    onProgress(rows written) is called every EXPORT_PROGRESS_INTERVAL rows
+    and at the end; an exception raised by it aborts the export.
+
+    Returns:
+        (file object positioned at 0, error): The caller closes the file.
+    """
+    output = None
+
+    try:
+        timesheets, error = getAllTimesheets(
+            orgId,
+            userId,
+            role,
+            dict(timesheetData, selected_fields=TIMESHEET_EXPORT_FIELDS),
+            download=True,
+            stream=True,
+        )
+
+        if error:
+            return None, error
+
+        if onProgress:
+            timesheets = _reportProgress(timesheets, onProgress)
+
+        startDate = timesheetData["start_date"] - timedelta(
+            days=timesheetData["start_date"].weekday()
+        )
+        endDate = timesheetData["end_date"] + timedelta(
+            days=6 - timesheetData["end_date"].weekday()
+        )
+
+        output = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_SIZE)
+        writeTimesheetWorkbook(output, timesheets, startDate, endDate)
+        output.seek(0)
+
+        return output, None
+
+    except Exception as e:
+        if output is not None:
+            output.close()
+
+        return None, str(e)
+
+
+def exportTimesheets(orgId, userId, role, timesheetData, onProgress=None):
+    """
+    Export the timesheet list matching timesheetData in timesheetData["format"]
+    (xlsx by default, csv or parquet; see EXPORT_FORMATS).
+
+    CSV and Parquet hold the raw data (ISO dates, unrounded hours) and are
+    written from batches of database rows without per-row dicts. With
+    timesheetData["detail"] == "day" they hold one row per entry and day
+    (DAY_DATA_COLUMNS) instead of one per timesheet.
+
+    Returns:
+        (content, error): content is a binary file object positioned at 0
+        (xlsx, parquet), or a generator of bytes chunks produced as the rows
+        are read (csv). The caller closes / consumes it.
+    """
+    exportFormat = timesheetData.get("format") or "xlsx"
+    perDay = timesheetData.get("detail") == "day"
+
+    if exportFormat == "xlsx":
+        if perDay:
+            return None, "The per-day export is only available as csv or parquet"
+
+        return downloadTimesheets(orgId, userId, role, timesheetData, onProgress)
+
+    if perDay:
+        batches, error = getTimesheetDayBatches(orgId, userId, role, timesheetData)
+        columnBatches, columnNames = map(_dayColumns, batches or []), DAY_DATA_COLUMNS
+    else:
+        batches, error = getTimesheetRowBatches(
+            orgId, userId, role, timesheetData, TIMESHEET_DATA_COLUMNS
+        )
+        columnBatches, columnNames = map(_timesheetColumns, batches or []), TIMESHEET_DATA_COLUMNS
+
+    if error:
+        return None, error
+
+    statuses = timesheetStatuses()
+
+    if exportFormat == "csv":
+        return _csvChunks(columnBatches, columnNames, statuses, onProgress), None
+
+    output = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_SIZE)
+
+    try:
+        _writeParquet(output, columnBatches, columnNames, statuses, onProgress)
+        output.seek(0)
+
+        return output, None
+
+    except Exception as e:
+        output.close()
+        return None, str(e)
+
+
+BenchmarkRow = namedtuple(
+    "BenchmarkRow", ["code", "user_name", "week_start", "week_end", "status", "total_hours"]
+)
+
+
+def benchmarkExportFormats(rowCount):
+    """
+    Time every export format on rowCount synthetic rows of the timesheet list
+    shape, from the row batches to the finished file (the database read is
+    the same for all of them and left out).
+
+    Returns:
+        dict: format -> {"seconds", "rows_per_second", "bytes"}, or
+        {"error"} when the format is not available.
+    """
+    statuses = timesheetStatuses()
+    statusIds = list(statuses.byId) or [0]
+    weekStart = date(2026, 1, 5)
+
+    def batches():
+        for start in range(0, rowCount, STREAM_BATCH_SIZE):
+            yield [
+                BenchmarkRow(
+                    f"{index:08d}-0000-4000-8000-000000000000",
+                    f"User {index % 5000}",
+                    weekStart + timedelta(weeks=index % 52),
+                    weekStart + timedelta(weeks=index % 52, days=6),
+                    statusIds[index % len(statusIds)],
+                    float(index % 45),
+                )
+                for index in range(start, min(start + STREAM_BATCH_SIZE, rowCount))
+            ]
+
+    def writeXlsx(output):
+        fieldNames = [name for name in TIMESHEET_LIST_FIELDS if name != "timesheet_code"]
+        rows = (
+            {name: TIMESHEET_LIST_FIELDS[name](row, statuses) for name in fieldNames}
+            for batch in batches()
+            for row in batch
+        )
+        writeTimesheetWorkbook(output, rows, weekStart, weekStart + timedelta(weeks=52))
+
+    def writeCsv(output):
+        for chunk in _csvChunks(map(_timesheetColumns, batches()), TIMESHEET_DATA_COLUMNS, statuses):
+            output.write(chunk)
+
+    writers = {
+        "xlsx": writeXlsx,
+        "csv": writeCsv,
+        "parquet": lambda output: _writeParquet(
+            output, map(_timesheetColumns, batches()), TIMESHEET_DATA_COLUMNS, statuses
+        ),
+    }
+    results = {}
+
+    for name, write in writers.items():
+        with tempfile.TemporaryFile() as output:
+            started = time.perf_counter()
+
+            try:
+                write(output)
+            except Exception as e:
+                results[name] = {"error": str(e)}
+                continue
+
+            seconds = time.perf_counter() - started
+            results[name] = {
+                "seconds": round(seconds, 3),
+                "rows_per_second": int(rowCount / seconds) if seconds else None,
+                "bytes": output.tell(),
+            }
+
+    return results
@@ -0,0 +1,79 @@
+import os
+from collections import namedtuple
+from datetime import date, timedelta
+
+from sqlalchemy import select
+
+from app.extensions import db
+from app.models.timesheets import Holiday
+from app.utils.cache import LRUCache
+
+
+# TTL: createHoliday only invalidates the caches of its own process, other
+# containers pick a new holiday up when their entry expires
+HOLIDAY_CALENDAR_CACHE_TTL = float(os.getenv("HOLIDAY_CALENDAR_CACHE_TTL", "300"))
+
+# (org id, year) -> frozenset of the holiday dates of that year
+holidayCalendarCache = LRUCache(
+    "holiday_calendar",
+    maxsize=int(os.getenv("HOLIDAY_CALENDAR_CACHE_SIZE", "1024")),
+    ttl=HOLIDAY_CALENDAR_CACHE_TTL,
+)
+
+# (org id, week start) -> week grid
+weekGridCache = LRUCache(
+    "week_grid",
+    maxsize=int(os.getenv("WEEK_GRID_CACHE_SIZE", "4096")),
+    ttl=HOLIDAY_CALENDAR_CACHE_TTL,
+)
+
+WeekDay = namedtuple("WeekDay", ["date", "is_weekend", "is_holiday"])
+
+
+def holidayDates(orgId, year):
+    """The holiday dates of an organization in a year, loaded once per TTL."""
+    key = (orgId, year)
+    dates = holidayCalendarCache.get(key)
+
+    if dates is None:
+        yearStart = date(year, 1, 1)
+        dates = frozenset(
+            db.session.execute(
+                select(Holiday.date).where(
+                    Holiday.org_id == orgId,
+                    Holiday.date >= yearStart,
+                    Holiday.date < yearStart.replace(year=year + 1),
+                )
+            ).scalars()
+        )
+        holidayCalendarCache.set(key, dates)
+
+    return dates
+
+
+def weekGrid(orgId, weekStart):
+    """
+    The seven days of the week starting at weekStart, as an immutable tuple
+    of WeekDay(date, is_weekend, is_holiday) shared by every caller.
+    """
+    key = (orgId, weekStart)
+    grid = weekGridCache.get(key)
+
+    if grid is None:
+        days = [weekStart + timedelta(days=i) for i in range(7)]
+        grid = tuple(
+            WeekDay(day, day.weekday() >= 5, day in holidayDates(orgId, day.year))
+            for day in days
+        )
+        weekGridCache.set(key, grid)
+
+    return grid
+
+
+def invalidateHolidayCalendar(orgId, year):
+    """Drop the cached calendar of an org / year and the week grids overlapping it."""
+    holidayCalendarCache.invalidate((orgId, year))
+    weekGridCache.invalidateWhere(
+        lambda key: key[0] == orgId
+        and year in (key[1].year, (key[1] + timedelta(days=6)).year)
+    )
@@ -0,0 +1,80 @@
+import threading
+from collections import namedtuple
+from types import MappingProxyType
+
+from app.models.timesheets import TimesheetStatus
+from app.models.users import UserRole
+
+
+LookupRow = namedtuple("LookupRow", ["id", "code", "name", "description"])
+
+
+class LookupTable:
+    """
+    Immutable code <-> id <-> name mapping of a small static lookup table.
+    """
+
+    def __init__(self, rows):
+        self.rows = tuple(sorted(rows, key=lambda row: row.id))
+        self.byId = MappingProxyType({row.id: row for row in self.rows})
+        self.byCode = MappingProxyType({row.code: row for row in self.rows})
+        self.byName = MappingProxyType({row.name: row for row in self.rows})
+
+    def nameOf(self, id):
+        row = self.byId.get(id)
+        return row.name if row else None
+
+    def idsForCodes(self, codes):
+        """IDs of the given codes; unknown codes are ignored."""
+        return [self.byCode[code].id for code in codes or [] if code in self.byCode]
+
+    def idsForNames(self, names):
+        return [self.byName[name].id for name in names or [] if name in self.byName]
+
+
+LookupRegistry = namedtuple("LookupRegistry", ["timesheetStatus", "userRole"])
+
+_registry = None
+_registryLock = threading.Lock()
+
+
+def _loadTable(model):
+    return LookupTable(
+        LookupRow(row.id, row.code, row.name, row.description)
+        for row in model.query.all()
+    )
+
+
+def getLookupRegistry():
+    """
+    Return the TimesheetStatus / UserRole registry, loading both tables the
+    first time it is needed in the process. The tables only change through
+    seed scripts, so the registry is never refreshed implicitly.
+    """
+    global _registry
+
+    if _registry is None:
+        with _registryLock:
+            if _registry is None:
+                _registry = LookupRegistry(
+                    timesheetStatus=_loadTable(TimesheetStatus),
+                    userRole=_loadTable(UserRole),
+                )
+
+    return _registry
+
+
+def reloadLookupRegistry():
+    """Drop the registry so the next call reloads it (after re-seeding the tables)."""
+    global _registry
+
+    with _registryLock:
+        _registry = None
+
+
+def timesheetStatuses():
+    return getLookupRegistry().timesheetStatus
+
+
+def userRoles():
+    return getLookupRegistry().userRole
@@ -1,9 +1,9 @@
 from app.models import Organization
 from app.extensions import db
-from app.utils.helpers import paginateQuery
+from app.utils.helpers import paginateKeyset, paginateQuery
 
 
-def getOrganization(page=1, per_page=10):
+def getOrganization(page=1, per_page=10, pagination="offset", cursor=None):
     try:
 
         query = (
@@ -16,7 +16,10 @@ def getOrganization(page=1, per_page=10):
             )
         )
 
-        orgs, meta = paginateQuery(query, page, per_page)
+        if pagination == "cursor":
+            orgs, meta = paginateKeyset(query, [Organization.id], cursor=cursor, per_page=per_page)
+        else:
+            orgs, meta = paginateQuery(query, page, per_page)
 
         orgList = [{
                     "code": org.code,
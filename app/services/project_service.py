@@ -2,34 +2,52 @@ from app.models import Project, User, Task
 from app.models.users import UserProject
 from app.services.common_service import getIdFromCode
 from app.extensions import db
-from app.utils.helpers import formatDatetime
+from app.utils.helpers import formatDatetime, selectFields
 
 
-def getProjects(orgId):
+# Fields of the project list (the fields= whitelist) and how each is serialized
+PROJECT_LIST_FIELDS = {
+    "code": lambda project: project.code,
+    "name": lambda project: project.name,
+    "description": lambda project: project.description,
+    "start_date": lambda project: formatDatetime(project.start_date, "%d %b %Y"),
+    "end_date": lambda project: formatDatetime(project.end_date,"%d %b %Y"),
+    "active": lambda project: project.active,
+}
+
+
+def getProjects(orgId, selectedFields=None):
     """
     Retrieve all projects for a given organization.
 
     :param org_id: Organization code or ID
+    :param selectedFields: Comma separated fields to fetch and return (all if empty)
     :return: Tuple (list of projects, error message)
     """
 
     try:
 
-        projects = Project().query.filter_by(org_id=orgId).all()
+        fieldNames = selectFields(selectedFields, PROJECT_LIST_FIELDS)
 
-        projectList = []
+        columns = {
+            "code": Project.code,
+            "name": Project.name,
+            "description": Project.description,
+            "start_date": Project.start_date,
+            "end_date": Project.end_date,
+            "active": Project.active,
+        }
 
-        for project in projects:
-            projectList.append(
-                {
-                    "code": project.code,
-                    "name": project.name,
-                    "description": project.description,
-                    "start_date": formatDatetime(project.start_date, "%d %b %Y"),
-                    "end_date": formatDatetime(project.end_date,"%d %b %Y"),
-                    "active": project.active,
-                }
-            )
+        projects = (
+            db.session.query(*(columns[name] for name in fieldNames))
+            .filter(Project.org_id == orgId)
+            .all()
+        )
+
+        projectList = [
+            {name: PROJECT_LIST_FIELDS[name](project) for name in fieldNames}
+            for project in projects
+        ]
 
         return projectList, None
 
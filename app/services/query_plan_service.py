@@ -0,0 +1,223 @@
+from datetime import date, timedelta
+
+from sqlalchemy import event, func, select, text
+
+from app.constants.lookups import ROLES, TIMESHEET_STATUS
+from app.extensions import db
+from app.models.projects import Project, Task
+from app.models.timesheets import (
+    Holiday,
+    ReminderTypeEnum,
+    Timesheet,
+    TimesheetEntry,
+    TimesheetEntryDay,
+    TimesheetHistory,
+    TimesheetReminder,
+    TimesheetSummary,
+    TimesheetSummaryProject,
+)
+from app.models.users import User, UserProject, UserSearchGram
+from app.services.timesheet_service import getTimesheetByCode
+from app.utils.time_records import packTimeRecords
+
+
+def hotQueries():
+    """
+    The predicates the services run on every request / cron, keyed by a
+    short name. The literal values do not matter, only the access path.
+    """
+    weekStart = date.today() - timedelta(days=date.today().weekday())
+
+    return {
+        "timesheet_entries_by_timesheet": select(TimesheetEntry.id).where(
+            TimesheetEntry.timesheet_id == 1,
+            TimesheetEntry.project_id == 1,
+            TimesheetEntry.status == TIMESHEET_STATUS["PENDING_APPROVAL"],
+        ),
+        "timesheet_entries_by_project": select(TimesheetEntry.timesheet_id).where(
+            TimesheetEntry.project_id == 1
+        ),
+        "timesheets_by_week": select(Timesheet.id).where(
+            Timesheet.week_start == weekStart,
+            Timesheet.user_id == 1,
+        ),
+        "timesheet_navigation": select(Timesheet.id)
+        .where(Timesheet.user_id == 1)
+        .order_by(Timesheet.week_start),
+        "holidays_by_org_year": select(Holiday.id).where(
+            Holiday.org_id == 1,
+            Holiday.date >= date(weekStart.year, 1, 1),
+            Holiday.date < date(weekStart.year + 1, 1, 1),
+        ),
+        "history_by_entry": select(TimesheetHistory.id).where(
+            TimesheetHistory.timesheet_entry_id == 1
+        ),
+        "reminders_by_timesheet": select(TimesheetReminder.id).where(
+            TimesheetReminder.timesheet_id == 1,
+            TimesheetReminder.reminder_type == ReminderTypeEnum.GENTLE,
+        ),
+        "users_by_org_role": select(User.id).where(User.org_id == 1, User.role_id == 1),
+        "projects_by_manager": select(Project.id).where(Project.manager_id == 1),
+        "user_project_by_user": select(UserProject.id).where(
+            UserProject.user_id == 1, UserProject.project_id == 1
+        ),
+        "summary_by_user": select(TimesheetSummary.timesheet_id)
+        .where(TimesheetSummary.user_id == 1)
+        .order_by(TimesheetSummary.week_start.desc())
+        .limit(10),
+        "summary_by_org_week": select(TimesheetSummary.timesheet_id).where(
+            TimesheetSummary.org_id == 1,
+            TimesheetSummary.week_start >= weekStart,
+        ),
+        "user_search_grams": select(UserSearchGram.user_id)
+        .where(UserSearchGram.gram.in_(["ali", "lic"]))
+        .group_by(UserSearchGram.user_id),
+        "entry_days_by_date": select(func.sum(TimesheetEntryDay.hours)).where(
+            TimesheetEntryDay.date == weekStart
+        ),
+        "summary_projects_by_project": select(
+            TimesheetSummaryProject.timesheet_id, func.sum(TimesheetSummaryProject.hours)
+        )
+        .where(TimesheetSummaryProject.project_id == 1)
+        .group_by(TimesheetSummaryProject.timesheet_id),
+    }
+
+
+def _explain(statement):
+    """
+    Return (plan lines, full scan tables) of a statement on the current database.
+    Supports MySQL (EXPLAIN) and SQLite (EXPLAIN QUERY PLAN).
+    """
+    dialect = db.engine.dialect
+    sql = str(statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+
+    if dialect.name == "sqlite":
+        rows = db.session.execute(text(f"EXPLAIN QUERY PLAN {sql}")).mappings().all()
+        lines = [row["detail"] for row in rows]
+        fullScans = [line.split()[1] for line in lines if line.startswith("SCAN ")]
+
+        return lines, fullScans
+
+    rows = db.session.execute(text(f"EXPLAIN {sql}")).mappings().all()
+    lines = [
+        f"{row['table']}: type={row['type']} key={row['key']} rows={row['rows']}"
+        for row in rows
+    ]
+    # ALL = table scan, index = scan of a whole index
+    fullScans = [row["table"] for row in rows if row["type"] in ("ALL", "index")]
+
+    return lines, fullScans
+
+
+def checkQueryPlans():
+    """
+    EXPLAIN every hot query.
+
+    Returns:
+        (dict, list): The plan lines by query name, and the names of the
+        queries that fall back to a full scan.
+    """
+    plans = {}
+    regressions = []
+
+    for name, statement in hotQueries().items():
+        lines, fullScans = _explain(statement)
+        plans[name] = lines
+
+        if fullScans:
+            regressions.append(name)
+
+    return plans, regressions
+
+
+def _countStatements(load):
+    statements = []
+
+    def onExecute(connection, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", onExecute)
+
+    try:
+        load()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", onExecute)
+
+    return len(statements)
+
+
+def checkTimesheetDetailQueryCount(entryCounts=(1, 4, 8)):
+    """
+    Load a throwaway timesheet through getTimesheetByCode with a growing
+    number of entries (each with a history row) and count the statements
+    of every load. The timesheet is written in a transaction that is
+    rolled back, so any database with a user and a task will do.
+
+    Returns:
+        dict: Number of entries -> number of statements.
+    """
+    user = db.session.execute(select(User.id, User.org_id).limit(1)).first()
+    task = db.session.execute(select(Task.id, Task.project_id).limit(1)).first()
+
+    if not user or not task:
+        raise ValueError("The database needs at least one user and one task")
+
+    counts = {}
+
+    try:
+        # A week no real timesheet uses (uq_user_week)
+        timesheet = Timesheet(
+            user_id=user.id,
+            week_start=date(1900, 1, 1),
+            week_end=date(1900, 1, 7),
+            status=TIMESHEET_STATUS["DRAFT"],
+        )
+        db.session.add(timesheet)
+        db.session.flush()
+        timesheetId, timesheetCode = timesheet.id, timesheet.code
+
+        def load():
+            data, error = getTimesheetByCode(
+                user.id, user.org_id, timesheetCode, ROLES["SUPER_ADMIN"], "view"
+            )
+
+            if error:
+                raise ValueError(error)
+
+        # Warm the process caches (lookups, holiday calendar) first
+        load()
+
+        added = 0
+
+        for entryCount in sorted(entryCounts):
+            while added < entryCount:
+                entry = TimesheetEntry(
+                    timesheet_id=timesheetId,
+                    project_id=task.project_id,
+                    task_id=task.id,
+                    status=TIMESHEET_STATUS["DRAFT"],
+                    hours=0,
+                    time_records=packTimeRecords([0] * 7),
+                )
+                db.session.add(entry)
+                db.session.flush()
+                db.session.add(
+                    TimesheetHistory(
+                        timesheet_entry_id=entry.id,
+                        old_status=TIMESHEET_STATUS["DRAFT"],
+                        new_status=TIMESHEET_STATUS["PENDING_APPROVAL"],
+                        changed_by=user.id,
+                    )
+                )
+                db.session.flush()
+                added += 1
+
+            # Load from the database, not from the identity map
+            db.session.expunge_all()
+            counts[entryCount] = _countStatements(load)
+
+    finally:
+        db.session.rollback()
+
+    return counts
+
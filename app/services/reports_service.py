@@ -2,7 +2,9 @@ from datetime import datetime, timedelta
 from sqlalchemy import distinct, func
 # from app.constants.lookups import TIMESHEET_STATUS
 from app.models import Project, User, Task
-from app.models.timesheets import Timesheet, TimesheetEntry, TimesheetStatus
+from app.models.timesheets import Timesheet, TimesheetEntry
+from app.services.common_service import getIdsFromCodes
+from app.services.lookup_service import timesheetStatuses
 from app.extensions import db
 
 
@@ -17,6 +19,20 @@ def getProjectReports(orgId, requestObj):
         print("getProjectReports")
         # ----- Project-level summary -----
 
+        startDate = endDate = None
+
+        # Resolve the filter codes once instead of joining Users/Projects to filter on them
+        userIds, _, error = getIdsFromCodes(User, requestObj.get("user_codes", []))
+        if error:
+            return None, error
+
+        projectIds, _, error = getIdsFromCodes(Project, requestObj.get("projects", []))
+        if error:
+            return None, error
+
+        userIds = list(userIds.values())
+        projectIds = list(projectIds.values())
+
         # Start date needs to be weeks first date i.e monday
         if requestObj.get("start_date"):
             startDate = requestObj["start_date"] - timedelta(days=requestObj["start_date"].weekday())
@@ -33,12 +49,10 @@ def getProjectReports(orgId, requestObj):
             )
             .join(TimesheetEntry, TimesheetEntry.project_id == Project.id)
             .join(Timesheet, TimesheetEntry.timesheet_id == Timesheet.id)
-            .join(TimesheetStatus, TimesheetEntry.status == TimesheetStatus.id)
             .join(Task, Task.id == TimesheetEntry.task_id)
-            .join(User, User.id == Timesheet.user_id)
             .filter(
                 Project.org_id == orgId,
-                User.code.in_(requestObj['user_codes']),
+                Timesheet.user_id.in_(userIds),
                 # Project.code.in_(requestObj['projects']),
                 Timesheet.week_start >= startDate if startDate else True,
                 Timesheet.week_start <= endDate if endDate else True,
@@ -68,13 +82,11 @@ def getProjectReports(orgId, requestObj):
             )
             .join(TimesheetEntry, TimesheetEntry.project_id == Project.id)
             .join(Timesheet, TimesheetEntry.timesheet_id == Timesheet.id)
-            .join(TimesheetStatus, TimesheetEntry.status == TimesheetStatus.id)
             .join(Task, Task.id == TimesheetEntry.task_id)
-            .join(User, User.id == Timesheet.user_id)
             .filter(
                 Project.org_id == orgId,
-                User.code.in_(requestObj['user_codes']),
-                Project.code.in_(requestObj['projects']),
+                Timesheet.user_id.in_(userIds),
+                TimesheetEntry.project_id.in_(projectIds),
                 Timesheet.week_start >= startDate if startDate else True,
                 Timesheet.week_start <= endDate if endDate else True,
                 # TimesheetStatus.id == TIMESHEET_STATUS["APPROVED"]
@@ -116,13 +128,12 @@ def getProjectReports(orgId, requestObj):
             )
             .select_from(Project)
             .join(TimesheetEntry, TimesheetEntry.project_id == Project.id)
-            .join(TimesheetStatus, TimesheetEntry.status == TimesheetStatus.id)
             .join(Timesheet, Timesheet.id == TimesheetEntry.timesheet_id)
             .join(User, User.id == Timesheet.user_id)
             .filter(
                 Project.org_id == orgId,
-                User.code.in_(requestObj['user_codes']),
-                Project.code.in_(requestObj['projects']),
+                Timesheet.user_id.in_(userIds),
+                TimesheetEntry.project_id.in_(projectIds),
                 Timesheet.week_start >= startDate if startDate else True,
                 Timesheet.week_start <= endDate if endDate else True,
                 # TimesheetStatus.id == TIMESHEET_STATUS["APPROVED"],
@@ -158,21 +169,25 @@ def getTimesheetReports(weeks_ago):
         end_date = datetime.now()
         start_date = end_date - timedelta(weeks=weeks_ago)
 
+        statuses = timesheetStatuses()
+
         weekly_data = (
             db.session.query(
                 Timesheet.week_start.label("week"),
-                TimesheetStatus.name.label("status"),
+                Timesheet.status,
                 func.count(Timesheet.id).label("count"),
                 func.coalesce(func.sum(TimesheetEntry.hours), 0).label("total_hours"),
             )
-            .join(TimesheetStatus, Timesheet.status == TimesheetStatus.id)
             .outerjoin(TimesheetEntry, Timesheet.id == TimesheetEntry.timesheet_id)
             .filter(Timesheet.week_start >= start_date.date())
-            .group_by(Timesheet.week_start, TimesheetStatus.name)
-            .order_by(Timesheet.week_start.desc(), TimesheetStatus.name)
+            .group_by(Timesheet.week_start, Timesheet.status)
             .all()
         )
 
+        # Newest week first, statuses by name within a week
+        weekly_data.sort(key=lambda row: statuses.nameOf(row.status) or "")
+        weekly_data.sort(key=lambda row: row.week, reverse=True)
+
         weeks = {}
         for row in weekly_data:
             week_key = row.week.isoformat()
@@ -184,7 +199,7 @@ def getTimesheetReports(weeks_ago):
                     "total_timesheets": 0,
                 }
 
-            weeks[week_key]["statuses"][row.status] = {
+            weeks[week_key]["statuses"][statuses.nameOf(row.status)] = {
                 "count": row.count,
                 "hours": float(row.total_hours),
             }
@@ -0,0 +1,129 @@
+import unicodedata
+
+from sqlalchemy import delete, event, func, insert, inspect, select
+
+from app.extensions import db
+from app.models.users import User, UserSearchGram
+
+
+# Longest substring stored per position; longer search terms are matched by their 3-grams
+GRAM_SIZE = 3
+
+# Users whose grams are rebuilt per transaction by rebuildUserSearchIndex
+SEARCH_INDEX_BATCH_SIZE = 1000
+
+
+def normalizeSearchText(value):
+    """Lower case with accents removed, so 'José' and 'jose' index the same."""
+    decomposed = unicodedata.normalize("NFKD", value or "")
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+
+
+def textGrams(*values):
+    """All distinct 1 to GRAM_SIZE character substrings of the given values."""
+    grams = set()
+
+    for value in values:
+        value = normalizeSearchText(value)
+
+        for size in range(1, GRAM_SIZE + 1):
+            grams.update(value[i:i + size] for i in range(len(value) - size + 1))
+
+    return grams
+
+
+def termGrams(term):
+    """The grams every value containing term must have."""
+    term = normalizeSearchText(term)
+
+    if len(term) <= GRAM_SIZE:
+        return {term} if term else set()
+
+    return {term[i:i + GRAM_SIZE] for i in range(len(term) - GRAM_SIZE + 1)}
+
+
+def userSearchCandidates(term):
+    """
+    Subquery of the ids of the users whose name or email may contain term.
+
+    Built from the gram index, so its cost follows the number of matches,
+    not the number of users. It can return false positives (the grams may
+    be spread over name and email), so callers still apply their ILIKE,
+    which then only runs on the candidates.
+    """
+    grams = termGrams(term)
+
+    return (
+        select(UserSearchGram.user_id)
+        .where(UserSearchGram.gram.in_(grams))
+        .group_by(UserSearchGram.user_id)
+        .having(func.count(UserSearchGram.gram) == len(grams))
+    )
+
+
+def _userGramRows(userId, fullName, email):
+    return [{"gram": gram, "user_id": userId} for gram in textGrams(fullName, email)]
+
+
+def indexUser(connection, userId, fullName, email):
+    """Replace the grams of a user, on the given connection / transaction."""
+    grams = UserSearchGram.__table__
+
+    connection.execute(delete(grams).where(grams.c.user_id == userId))
+    rows = _userGramRows(userId, fullName, email)
+
+    if rows:
+        connection.execute(insert(grams), rows)
+
+
+def rebuildUserSearchIndex(batchSize=SEARCH_INDEX_BATCH_SIZE):
+    """
+    Rebuild the grams of every user, committing per batch.
+
+    Returns:
+        int: Number of users indexed.
+    """
+    grams = UserSearchGram.__table__
+    total = 0
+    lastId = 0
+
+    while True:
+        users = db.session.execute(
+            select(User.id, User.full_name, User.email)
+            .where(User.id > lastId)
+            .order_by(User.id)
+            .limit(batchSize)
+        ).all()
+
+        if not users:
+            return total
+
+        userIds = [user.id for user in users]
+        db.session.execute(delete(grams).where(grams.c.user_id.in_(userIds)))
+
+        rows = [
+            row
+            for user in users
+            for row in _userGramRows(user.id, user.full_name, user.email)
+        ]
+
+        if rows:
+            db.session.execute(insert(grams), rows)
+
+        db.session.commit()
+
+        total += len(users)
+        lastId = userIds[-1]
+
+
+@event.listens_for(User, "after_insert")
+def _onUserCreated(mapper, connection, target):
+    indexUser(connection, target.id, target.full_name, target.email)
+
+
+@event.listens_for(User, "after_update")
+def _onUserSearchFieldsUpdated(mapper, connection, target):
+    state = inspect(target)
+
+    if state.attrs.full_name.history.has_changes() or state.attrs.email.history.has_changes():
+        indexUser(connection, target.id, target.full_name, target.email)
@@ -1,20 +1,226 @@
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
-import io
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+import hashlib
+import json
+import os
 
 
-from sqlalchemy import Case, desc, extract, func
+from sqlalchemy import Case, desc, event, func, inspect, select, update
+from sqlalchemy.orm import Session, aliased, joinedload, selectinload
 from app.constants.lookups import ROLES, TIMESHEET_STATUS
-from app.models import Holiday, TimesheetStatus, Timesheet
+from app.models import Holiday, Timesheet
 from app.models.projects import Project, Task
-from app.models.timesheets import TimesheetEntry, TimesheetHistory
-from app.models.users import User
-from app.services.common_service import getIdFromCode
+from app.models.timesheets import (
+    TimesheetEntry,
+    TimesheetEntryDay,
+    TimesheetHistory,
+    TimesheetSummary,
+    TimesheetSummaryProject,
+)
+from app.models.users import Organization, User
+from app.services.common_service import getIdFromCode, getIdsFromCodes
+from app.services.holiday_calendar_service import invalidateHolidayCalendar, weekGrid
+from app.services.lookup_service import timesheetStatuses
+from app.services.search_service import userSearchCandidates
+from app.services.timesheet_summary_service import refreshTimesheetSummaries
 from app.extensions import db
 
-from app.utils.helpers import formatDatetime, paginateQuery
+from app.utils.cache import LRUCache
+from app.utils.time_records import (
+    expandTimeRecords,
+    packTimeRecords,
+    weekHours,
+    weekNotes,
+)
+from app.utils.helpers import (
+    STREAM_BATCH_SIZE,
+    formatDatetime,
+    paginateKeyset,
+    paginateQuery,
+    selectFields,
+)
+
+
+# (org id or None for cross-org lists, filter fingerprint) -> total rows of the timesheet list
+timesheetCountCache = LRUCache(
+    "timesheet_count",
+    maxsize=int(os.getenv("TIMESHEET_COUNT_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("TIMESHEET_COUNT_CACHE_TTL", "60")),
+)
+
+
+def markTimesheetsChanged(timesheetIds, session=None):
+    """
+    Record timesheets written outside the unit of work (Query.update() etc.),
+    so the caches derived from them are invalidated when the session commits.
+    Changes made through mapped objects are recorded automatically.
+    """
+    session = session or db.session()
+    session.info.setdefault("changed_timesheets", set()).update(
+        timesheetId for timesheetId in timesheetIds if timesheetId is not None
+    )
+
+
+@event.listens_for(Timesheet, "after_insert")
+@event.listens_for(Timesheet, "after_update")
+def _onTimesheetWritten(mapper, connection, target):
+    markTimesheetsChanged([target.id], Session.object_session(target))
+
+
+@event.listens_for(TimesheetEntry, "after_insert")
+@event.listens_for(TimesheetEntry, "after_update")
+@event.listens_for(TimesheetEntry, "after_delete")
+def _onTimesheetEntryWritten(mapper, connection, target):
+    markTimesheetsChanged([target.timesheet_id], Session.object_session(target))
+
+
+@event.listens_for(Session, "before_commit")
+@event.listens_for(Session, "after_flush_postexec")
+def _processChangedTimesheets(session, *args):
+    # Still inside the transaction: refresh the read model of the changed
+    # timesheets, bump their data versions and map them to their
+    # organizations for the cache invalidation
+    timesheetIds = session.info.pop("changed_timesheets", None)
+
+    if timesheetIds:
+        refreshTimesheetSummaries(session, timesheetIds)
+
+        orgIds = set(
+            session.execute(
+                select(User.org_id)
+                .join(Timesheet, Timesheet.user_id == User.id)
+                .where(Timesheet.id.in_(timesheetIds))
+                .distinct()
+            ).scalars()
+        )
+
+        bumpTimesheetVersions(session, timesheetIds, orgIds)
+        session.info.setdefault("changed_timesheet_orgs", set()).update(orgIds)
+
+
+def bumpTimesheetVersions(session, timesheetIds=(), orgIds=()):
+    """Increment the data versions the timesheet ETags are derived from."""
+    timesheets = Timesheet.__table__
+    organizations = Organization.__table__
+
+    if timesheetIds:
+        session.execute(
+            update(timesheets)
+            .where(timesheets.c.id.in_(list(timesheetIds)))
+            .values(version=timesheets.c.version + 1)
+        )
+
+    if orgIds:
+        session.execute(
+            update(organizations)
+            .where(organizations.c.id.in_(list(orgIds)))
+            .values(timesheet_version=organizations.c.timesheet_version + 1)
+        )
+
+
+def bumpEntryTimesheetVersions(connection, criterion, orgIds):
+    """
+    Bump the data versions of the timesheets with an entry matching
+    criterion (a project / task change shows in their details and exports)
+    and of their organizations' lists.
+    """
+    timesheets = Timesheet.__table__
+    organizations = Organization.__table__
+
+    connection.execute(
+        update(timesheets)
+        .where(
+            timesheets.c.id.in_(
+                select(TimesheetEntry.timesheet_id).where(criterion).distinct()
+            )
+        )
+        .values(version=timesheets.c.version + 1)
+    )
+    connection.execute(
+        update(organizations)
+        .where(organizations.c.id.in_(list(orgIds)))
+        .values(timesheet_version=organizations.c.timesheet_version + 1)
+    )
+
+
+@event.listens_for(Project, "after_update")
+def _onProjectChanged(mapper, connection, target):
+    # Its name shows in the timesheet details / exports, and the manager
+    # decides can_approve and the manager filtered lists
+    state = inspect(target)
+
+    if state.attrs.name.history.has_changes() or state.attrs.manager_id.history.has_changes():
+        bumpEntryTimesheetVersions(
+            connection, TimesheetEntry.project_id == target.id, [target.org_id]
+        )
+        state.session.info.setdefault("changed_timesheet_orgs", set()).add(target.org_id)
+
+
+@event.listens_for(Task, "after_update")
+def _onTaskChanged(mapper, connection, target):
+    # Its name and project show in the timesheet details / exports
+    state = inspect(target)
+    projectHistory = state.attrs.project_id.history
+
+    if state.attrs.name.history.has_changes() or projectHistory.has_changes():
+        orgIds = set(
+            connection.execute(
+                select(Project.org_id).where(
+                    Project.id.in_([target.project_id, *projectHistory.deleted])
+                )
+            ).scalars()
+        )
+        bumpEntryTimesheetVersions(connection, TimesheetEntry.task_id == target.id, orgIds)
+        state.session.info.setdefault("changed_timesheet_orgs", set()).update(orgIds)
+
+
+def getTimesheetListVersion(orgId, role):
+    """
+    Data version of the timesheet lists visible to a role: the organization's
+    version, or the sum over all organizations for the cross-org Super Admin lists.
+    """
+    if role == ROLES["SUPER_ADMIN"]:
+        return db.session.query(
+            func.coalesce(func.sum(Organization.timesheet_version), 0)
+        ).scalar()
+
+    return (
+        db.session.query(Organization.timesheet_version)
+        .filter(Organization.id == orgId)
+        .scalar()
+    )
+
+
+def getTimesheetVersion(navigation):
+    """
+    Data version of a timesheet's details from its getTimesheetNavigation
+    row: its own version plus the codes and versions of the neighbouring
+    weeks, whose summaries are part of the response.
+    """
+    return tuple(
+        navigation[key]
+        for key in (
+            "version",
+            "previous_code",
+            "previous_version",
+            "next_code",
+            "next_version",
+        )
+    )
+
+
+@event.listens_for(Session, "after_commit")
+def _onTimesheetsCommitted(session):
+    orgIds = session.info.pop("changed_timesheet_orgs", None)
+
+    if orgIds:
+        timesheetCountCache.invalidateWhere(lambda key: key[0] is None or key[0] in orgIds)
+
+
+@event.listens_for(Session, "after_rollback")
+def _onTimesheetsRolledBack(session):
+    session.info.pop("changed_timesheets", None)
+    session.info.pop("changed_timesheet_orgs", None)
 
 
 def getHolidays(orgId, year):
@@ -30,9 +236,14 @@ def getHolidays(orgId, year):
 
     try:
 
+        # A date range (not EXTRACT(YEAR ...)) so ix_holidays_org_date can be used
+        yearStart = date(int(year), 1, 1)
+
         holidays = (
             Holiday.query.filter(
-                Holiday.org_id == orgId, extract("year", Holiday.date) == year
+                Holiday.org_id == orgId,
+                Holiday.date >= yearStart,
+                Holiday.date < yearStart.replace(year=yearStart.year + 1),
             )
             .order_by(Holiday.date)
             .all()
@@ -74,33 +285,26 @@ def getUserTimesheets(orgId, userId, role, timesheetData, page=1, per_page=10):
 
     try:
 
+        statuses = timesheetStatuses()
+
         query = (
             db.session.query(
-                Timesheet.code,
-                Timesheet.week_start,
-                Timesheet.week_end,
-                TimesheetStatus.name.label("timesheet_status"),
-                User.full_name.label("user_name"),
-                func.coalesce(func.sum(TimesheetEntry.hours), 0).label("total_hours"),
+                TimesheetSummary.code,
+                TimesheetSummary.week_start,
+                TimesheetSummary.week_end,
+                TimesheetSummary.status,
+                TimesheetSummary.user_name,
+                TimesheetSummary.total_hours,
             )
-            .outerjoin(User, User.id == Timesheet.user_id)
-            .outerjoin(TimesheetStatus, TimesheetStatus.id == Timesheet.status)
-            .outerjoin(TimesheetEntry, TimesheetEntry.timesheet_id == Timesheet.id)
-            .group_by(
-                Timesheet.code,
-                Timesheet.week_start,
-                Timesheet.week_end,
-                TimesheetStatus.name,
-                User.full_name,
-            )
-            .order_by(desc(Timesheet.week_start))
+            .filter(TimesheetSummary.user_id == userId)
+            .order_by(desc(TimesheetSummary.week_start))
         )
 
-        query = query.filter(User.id == userId)
-
         if timesheetData.get("timesheet_status"):
             query = query.filter(
-                TimesheetStatus.code == timesheetData["timesheet_status"]
+                TimesheetSummary.status.in_(
+                    statuses.idsForCodes(timesheetData["timesheet_status"])
+                )
             )
 
         # if timesheetData.get("user_name"):
@@ -108,7 +312,17 @@ def getUserTimesheets(orgId, userId, role, timesheetData, page=1, per_page=10):
         # 		User.full_name.ilike(f"%{timesheetData['user_name']}%")
         # 	)
 
-        allTimesheets, meta = paginateQuery(query, page, per_page)
+        if timesheetData.get("pagination") == "cursor":
+            allTimesheets, meta = paginateKeyset(
+                query,
+                [TimesheetSummary.week_start, TimesheetSummary.timesheet_id],
+                cursor=timesheetData.get("cursor"),
+                per_page=per_page,
+                descending=True,
+            )
+        else:
+            allTimesheets, meta = paginateQuery(query, page, per_page)
+
         timesheetList = []
 
         timesheetList = [
@@ -118,7 +332,7 @@ def getUserTimesheets(orgId, userId, role, timesheetData, page=1, per_page=10):
                 "user_name": item.user_name,
                 "week_start": formatDatetime(item.week_start),
                 "week_end": formatDatetime(item.week_end),
-                "timesheet_status": item.timesheet_status,
+                "timesheet_status": statuses.nameOf(item.status),
             }
             for item in allTimesheets
         ]
@@ -129,8 +343,185 @@ def getUserTimesheets(orgId, userId, role, timesheetData, page=1, per_page=10):
         return None, str(e)
 
 
+# Sort priority of the "timesheet_status" sort option (lower comes first)
+TIMESHEET_STATUS_PRIORITY = {
+    "Pending Approval": 0,
+    "Partially Approved": 0,
+    "Partially Rejected": 0,
+    "Rejected": 1,
+    "Draft": 2,
+    "Approved": 3,
+}
+
+
+# Fields of the timesheet list (the fields= whitelist) and how each is serialized
+TIMESHEET_LIST_FIELDS = {
+    "total_hours": lambda item, statuses: round(item.total_hours, 2),
+    "timesheet_code": lambda item, statuses: item.code,
+    "user_name": lambda item, statuses: item.user_name,
+    "week_start": lambda item, statuses: formatDatetime(item.week_start, "%b %d, %Y"),
+    "week_end": lambda item, statuses: formatDatetime(item.week_end, "%b %d, %Y"),
+    "timesheet_status": lambda item, statuses: statuses.nameOf(item.status),
+}
+
+
+def _searchTerm(timesheetData):
+    """The search term of a list request as filtered on (and cached by _timesheetCountKey)."""
+    return (timesheetData.get("search") or "").strip()
+
+
+def _timesheetListFilters(orgId, userId, role, timesheetData, projectColumn):
+    """
+    The criteria of the timesheet list filters (period, role scope, status,
+    projects, search, user) on TimesheetSummary; projectColumn is the
+    project id column the projects / manager filters apply to.
+    """
+    statuses = timesheetStatuses()
+
+    projectIds, _, error = getIdsFromCodes(Project, timesheetData["projects"] or [])
+
+    if error:
+        raise Exception(error)
+
+    criteria = [projectColumn.in_(list(projectIds.values()))]
+
+    if timesheetData["start_date"]:
+        startDate = timesheetData["start_date"]
+        # - timedelta(
+        #     days=timesheetData["start_date"].weekday()
+        # )
+        criteria.append(TimesheetSummary.week_start >= startDate)
+
+    if timesheetData["end_date"]:
+        endDate = timesheetData["end_date"]
+        # + timedelta(
+        #     days=6 - timesheetData["end_date"].weekday()
+        # )
+        criteria.append(TimesheetSummary.week_end <= endDate)
+
+    if role == ROLES["HR"]:
+        criteria.append(TimesheetSummary.org_id == orgId)
+
+    if role == ROLES["MANAGER"]:
+        criteria.append(
+            projectColumn.in_(select(Project.id).where(Project.manager_id == userId))
+        )
+
+    elif role == ROLES["EMPLOYEE"]:
+        criteria.append(TimesheetSummary.user_id == userId)
+
+    # if timesheetData.get("timesheet_status"):
+    criteria.append(
+        TimesheetSummary.status.in_(statuses.idsForCodes(timesheetData["timesheet_status"]))
+    )
+
+    search = _searchTerm(timesheetData)
+
+    if search:
+        criteria += [
+            TimesheetSummary.user_id.in_(userSearchCandidates(search)),
+            TimesheetSummary.user_name.ilike(f"%{search}%"),
+        ]
+
+    if timesheetData.get("user_code"):
+        userIds, _, error = getIdsFromCodes(User, [timesheetData["user_code"]])
+
+        if error:
+            raise Exception(error)
+
+        criteria.append(TimesheetSummary.user_id.in_(list(userIds.values())))
+
+    return criteria
+
+
+def _timesheetListQuery(orgId, userId, role, timesheetData, fieldNames=TIMESHEET_LIST_FIELDS):
+    """
+    Build the filtered timesheet list query shared by the search and download APIs.
+
+    Reads the timesheet_summary read model; total_hours is the sum of the
+    hours logged on the requested projects only. Only the columns of
+    fieldNames are selected (the SUM is skipped when total_hours is not).
+
+    Returns:
+        (query, sortColumn): sortColumn is the expression of the requested
+        sort_by option, or None when no (known) sort was requested.
+    """
+    statuses = timesheetStatuses()
+    totalHours = func.coalesce(func.sum(TimesheetSummaryProject.hours), 0)
+
+    columns = {
+        "total_hours": totalHours.label("total_hours"),
+        "timesheet_code": TimesheetSummary.code,
+        "user_name": TimesheetSummary.user_name,
+        "week_start": TimesheetSummary.week_start,
+        "week_end": TimesheetSummary.week_end,
+        "timesheet_status": TimesheetSummary.status,
+    }
+
+    query = (
+        db.session.query(*(columns[name] for name in fieldNames))
+        .join(
+            TimesheetSummaryProject,
+            TimesheetSummaryProject.timesheet_id == TimesheetSummary.timesheet_id,
+        )
+        .filter(
+            *_timesheetListFilters(
+                orgId, userId, role, timesheetData, TimesheetSummaryProject.project_id
+            )
+        )
+        .group_by(
+            TimesheetSummary.timesheet_id,
+            TimesheetSummary.code,
+            TimesheetSummary.week_start,
+            TimesheetSummary.week_end,
+            TimesheetSummary.status,
+            TimesheetSummary.user_name,
+        )
+    )
+
+    sort_columns = {
+        "user_name": func.coalesce(TimesheetSummary.user_name, ""),
+        "week_start": TimesheetSummary.week_start,
+        "week_end": TimesheetSummary.week_end,
+        "timesheet_status": Case(
+            *(
+                (TimesheetSummary.status == statuses.byName[status].id, priority)
+                for status, priority in TIMESHEET_STATUS_PRIORITY.items()
+                if status in statuses.byName
+            ),
+            else_=99,
+        ),
+        "total_hours": totalHours,
+    }
+
+    return query, sort_columns.get(timesheetData.get("sort_by"))
+
+
+def _timesheetCountKey(orgId, userId, role, timesheetData):
+    """
+    Cache key of the total count of a timesheet list: the filters that change
+    the result set, normalized so equivalent requests share one entry.
+    Sorting and paging never change the total and are left out.
+    """
+    filters = {
+        "role": role,
+        "user_id": userId if role in (ROLES["MANAGER"], ROLES["EMPLOYEE"]) else None,
+        "start_date": str(timesheetData["start_date"] or ""),
+        "end_date": str(timesheetData["end_date"] or ""),
+        "timesheet_status": sorted(set(timesheetData["timesheet_status"] or [])),
+        "projects": sorted(set(timesheetData["projects"] or [])),
+        "search": _searchTerm(timesheetData),
+        "user_code": timesheetData.get("user_code") or "",
+    }
+    fingerprint = hashlib.sha256(
+        json.dumps(filters, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+    return (None if role == ROLES["SUPER_ADMIN"] else orgId, fingerprint)
+
+
 def getAllTimesheets(
-    orgId, userId, role, timesheetData, page=1, per_page=10, download=False
+    orgId, userId, role, timesheetData, page=1, per_page=10, download=False, stream=False
 ):
     """
     Fetch paginated timesheet records with filtering based on role and input data.
@@ -139,165 +530,93 @@ def getAllTimesheets(
             orgId (int): Organization ID (required for HR role).
             userId (int): User ID (required for Employee role).
             role (str): User role ("Super Admin", "HR", "Employee").
-            timesheetData (dict): Filter parameters.
+            timesheetData (dict): Filter parameters. With pagination="cursor"
+                    the list is paginated by keyset, continuing after "cursor";
+                    selected_fields limits the fields fetched and returned.
             page (int): Pagination page number.
             per_page (int): Items per page.
+            download (bool): Return every matching timesheet, unpaginated.
+            stream (bool): With download, return the timesheets as a generator
+                    reading the rows in batches (yield_per) instead of a list.
+
+    The total count is only computed when timesheetData["include_total"] is
+    true (the default), and is then cached per filter set for a short time.
 
     Returns:
             dict, error: Returns response dict or error string.
     """
 
     try:
-        status_priority = {
-            "Pending Approval": 0,
-            "Partially Approved": 0,
-            "Partially Rejected": 0,
-            "Rejected": 1,
-            "Draft": 2,
-            "Approved": 3,
-        }
+        statuses = timesheetStatuses()
 
-        query = (
-            db.session.query(
-                Timesheet.code,
-                Timesheet.week_start,
-                Timesheet.week_end,
-                TimesheetStatus.name.label("timesheet_status"),
-                User.full_name.label("user_name"),
-                func.coalesce(func.sum(TimesheetEntry.hours), 0).label("total_hours"),
-            )
-            .outerjoin(User, User.id == Timesheet.user_id)
-            .outerjoin(TimesheetStatus, TimesheetStatus.id == Timesheet.status)
-            .outerjoin(TimesheetEntry, TimesheetEntry.timesheet_id == Timesheet.id)
-            .outerjoin(Project, TimesheetEntry.project_id == Project.id)
-            .group_by(
-                Timesheet.code,
-                Timesheet.week_start,
-                Timesheet.week_end,
-                TimesheetStatus.name,
-                User.full_name,
-            )
-            # .order_by(
-            #     Case(
-            #         *[
-            #             (TimesheetStatus.name == status, priority)
-            #             for status, priority in status_priority.items()
-            #         ],
-            #         else_=99,
-            #     ),
-            # )
+        fieldNames = (
+            list(TIMESHEET_LIST_FIELDS)
+            if download and not stream
+            else selectFields(timesheetData.get("selected_fields"), TIMESHEET_LIST_FIELDS)
         )
 
-        if timesheetData["start_date"]:
-            startDate = timesheetData["start_date"] 
-            # - timedelta(
-            #     days=timesheetData["start_date"].weekday()
-            # )
-            query = query.filter(Timesheet.week_start >= startDate)
-
-        if timesheetData["end_date"]:
-            endDate = timesheetData["end_date"] 
-            # + timedelta(
-            #     days=6 - timesheetData["end_date"].weekday()
-            # )
-            query = query.filter(Timesheet.week_end <= endDate)
-
-        if role == ROLES["HR"]:
-            query = query.filter(User.org_id == orgId)
-
-        if role == ROLES["MANAGER"]:
-            query = query.filter(Project.manager_id == userId)
-
-        elif role == ROLES["EMPLOYEE"]:
-            query = query.filter(User.id == userId)
-
-        # if timesheetData.get("timesheet_status"):
-        query = query.filter(
-            TimesheetStatus.code.in_(timesheetData["timesheet_status"]),
-            Project.code.in_(timesheetData["projects"]),
+        query, sortColumn = _timesheetListQuery(
+            orgId, userId, role, timesheetData, fieldNames
         )
 
-        if timesheetData.get("search") and timesheetData["search"] != "":
-            query = query.filter(User.full_name.ilike(f"%{timesheetData['search']}%"))
-
-        if timesheetData.get("user_code"):
-            query = query.filter(User.code == timesheetData["user_code"])
-
-        sort_columns = {
-            "user_name": User.full_name,
-            "week_start": Timesheet.week_start,
-            "week_end": Timesheet.week_end,
-            "timesheet_status": "",
-            "total_hours": "total_hours",
-        }
-
-        sort_by = timesheetData.get("sort_by")
         sort_direction = timesheetData.get("sort_direction", "asc").lower()
 
-        if sort_by in sort_columns:
-            column = sort_columns[sort_by]
-
-            # Use func.lower for string columns (like full_name)
-            # if sort_by == "user_name":
-            # 	column = func.lower(column)
-
-            if sort_by == "timesheet_status":
-                # Custom order using status_priority
-                case_order = Case(
-                    *( (TimesheetStatus.name == status, priority) for status, priority in status_priority.items() ),
-                    else_=99
+        if download:
+            if sortColumn is not None:
+                query = query.order_by(
+                    sortColumn.desc() if sort_direction == "desc" else sortColumn.asc()
                 )
-                if sort_direction == "desc":
-                    query = query.order_by(desc(case_order))
-                else:
-                    query = query.order_by(case_order)
-
-            else:
 
-                # Apply ascending or descending
-                if sort_direction == "desc":
-                    query = (
-                        query.order_by(column.desc())
-                        if sort_by != "total_hours"
-                        else query.order_by(desc(column))
-                    )
-                else:
-                    query = (
-                        query.order_by(column.asc())
-                        if sort_by != "total_hours"
-                        else query.order_by(column)
-                    )
+            if stream:
+                return (
+                    {name: TIMESHEET_LIST_FIELDS[name](item, statuses) for name in fieldNames}
+                    for item in query.yield_per(STREAM_BATCH_SIZE)
+                ), None
 
-        if download:
             allTimesheets = query.all()
             timesheetList = []
 
             timesheetList = [
-                {
-                    "total_hours": round(item.total_hours, 2),
-                    "timesheet_code": item.code,
-                    "user_name": item.user_name,
-                    "week_start": formatDatetime(item.week_start, "%b %d, %Y"),
-                    "week_end": formatDatetime(item.week_end, "%b %d, %Y"),
-                    "timesheet_status": item.timesheet_status,
-                }
+                {name: TIMESHEET_LIST_FIELDS[name](item, statuses) for name in fieldNames}
                 for item in allTimesheets
             ]
 
             return {"timesheet": timesheetList}, None
 
-        allTimesheets, meta = paginateQuery(query, page, per_page)
+        if timesheetData.get("pagination") == "cursor":
+            # Sort key + id, so every page is a range scan after the previous one
+            keyColumns = [TimesheetSummary.timesheet_id]
+
+            if sortColumn is not None:
+                keyColumns.insert(0, sortColumn)
+
+            allTimesheets, meta = paginateKeyset(
+                query,
+                keyColumns,
+                cursor=timesheetData.get("cursor"),
+                per_page=per_page,
+                descending=sort_direction == "desc",
+                aggregate=timesheetData.get("sort_by") == "total_hours",
+            )
+        else:
+            if sortColumn is not None:
+                query = query.order_by(
+                    sortColumn.desc() if sort_direction == "desc" else sortColumn.asc()
+                )
+
+            allTimesheets, meta = paginateQuery(
+                query,
+                page,
+                per_page,
+                include_total=timesheetData.get("include_total", True),
+                countCache=timesheetCountCache,
+                countKey=_timesheetCountKey(orgId, userId, role, timesheetData),
+            )
+
         timesheetList = []
 
         timesheetList = [
-            {
-                "total_hours": round(item.total_hours, 2),
-                "timesheet_code": item.code,
-                "user_name": item.user_name,
-                "week_start": formatDatetime(item.week_start, "%b %d, %Y"),
-                "week_end": formatDatetime(item.week_end, "%b %d, %Y"),
-                "timesheet_status": item.timesheet_status,
-            }
+            {name: TIMESHEET_LIST_FIELDS[name](item, statuses) for name in fieldNames}
             for item in allTimesheets
         ]
 
@@ -307,175 +626,106 @@ def getAllTimesheets(
         return None, str(e)
 
 
-def downloadTimesheets(orgId, userId, role, timesheetData):
-    # Get all timesheets
-    timesheets, error = getAllTimesheets(
-        orgId, userId, role, timesheetData, download=True
-    )
-    if error:
-        return None, error
+def getTimesheetRowBatches(orgId, userId, role, timesheetData, fieldNames):
+    """
+    The unpaginated timesheet list as raw rows, for the columnar exports.
 
-    if timesheetData["start_date"]:
-        startDate = timesheetData["start_date"] - timedelta(
-            days=timesheetData["start_date"].weekday()
-        )
+    The rows hold the columns of fieldNames (timesheet_code as "code",
+    timesheet_status as the status id) and are read with yield_per.
 
-    if timesheetData["end_date"]:
-        endDate = timesheetData["end_date"] + timedelta(
-            days=6 - timesheetData["end_date"].weekday()
+    Returns:
+        (iterator of lists of up to STREAM_BATCH_SIZE rows, error)
+    """
+    try:
+        query, sortColumn = _timesheetListQuery(
+            orgId, userId, role, timesheetData, fieldNames
         )
 
-    # Create a workbook and sheet
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Timesheets"
-
-    # Define colors
-    STELLAR_BLUE = "4F81BD"
-    # HEADER_GRAY = "D9D9D9"
-    LIGHT_BLUE = "DAE3F3"
-    BORDER_COLOR = "000000"
-
-    # Create border style
-    thin_border = Border(
-        left=Side(style="thin", color=BORDER_COLOR),
-        right=Side(style="thin", color=BORDER_COLOR),
-        top=Side(style="thin", color=BORDER_COLOR),
-        bottom=Side(style="thin", color=BORDER_COLOR),
-    )
-
-    # Row 1: "Stellar IT" title
-    ws.merge_cells("A1:D1")
-    stellar_cell = ws.cell(row=1, column=1, value="Stellar IT")
-    stellar_cell.font = Font(bold=True, size=16, color="FFFFFF")
-    stellar_cell.fill = PatternFill(
-        start_color=STELLAR_BLUE, end_color=STELLAR_BLUE, fill_type="solid"
-    )
-    stellar_cell.alignment = Alignment(horizontal="center", vertical="center")
-
-    # Make row 1 taller
-    ws.row_dimensions[1].height = 30
-
-    # Row 2: Period date (if timesheets exist)
-    header_start_row = 2  # Track where headers will start
-
-    # if timesheets.get("timesheet"):
-
-    period_text = f"Period: {formatDatetime(startDate, '%b %d, %Y')} - {formatDatetime(endDate, '%b %d, %Y')}"
+        if sortColumn is not None:
+            sort_direction = timesheetData.get("sort_direction", "asc").lower()
+            query = query.order_by(
+                sortColumn.desc() if sort_direction == "desc" else sortColumn.asc()
+            )
 
-    ws.merge_cells("A2:D2")
-    period_cell = ws.cell(row=2, column=1, value=period_text)
-    period_cell.font = Font(bold=True, size=12)
-    period_cell.alignment = Alignment(horizontal="center", vertical="center")
+        return db.session.execute(
+            query.statement, execution_options={"yield_per": STREAM_BATCH_SIZE}
+        ).partitions(), None
 
-    # Make row 2 taller
-    ws.row_dimensions[2].height = 25
-    header_start_row = 3
+    except Exception as e:
+        return None, str(e)
 
-    # Define headers
-    headers = ["User Name", "Period", "Status", "Total Hours"]
 
-    # Style headers
-    header_font = Font(bold=True, color="FFFFFF", size=11)
-    header_fill = PatternFill(
-        start_color=STELLAR_BLUE, end_color=STELLAR_BLUE, fill_type="solid"
-    )
-    alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-
-    # Write headers with styling
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=header_start_row, column=col_num, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = alignment
-        cell.border = thin_border
-
-    # Make header row taller
-    ws.row_dimensions[header_start_row].height = 25
-
-    # Write timesheet rows with alternating row colors
-    start_row = header_start_row + 1
-    for idx, ts in enumerate(timesheets.get("timesheet", [])):
-        row_num = start_row + idx
-
-        # Alternate row colors
-        if idx % 2 == 0:
-            row_fill = PatternFill(
-                start_color="FFFFFF", end_color="FFFFFF", fill_type="solid"
+def _timesheetDaySelect(orgId, userId, role, timesheetData, *columns):
+    """select(*columns) over the timesheet_entry_days rows of the per-day export."""
+    return (
+        select(*columns)
+        .select_from(TimesheetEntryDay)
+        .join(TimesheetEntry, TimesheetEntry.id == TimesheetEntryDay.entry_id)
+        .join(TimesheetSummary, TimesheetSummary.timesheet_id == TimesheetEntryDay.timesheet_id)
+        .join(Project, Project.id == TimesheetEntry.project_id)
+        .outerjoin(Task, Task.id == TimesheetEntry.task_id)
+        .where(
+            *_timesheetListFilters(
+                orgId, userId, role, timesheetData, TimesheetEntry.project_id
             )
-        else:
-            row_fill = PatternFill(
-                start_color=LIGHT_BLUE, end_color=LIGHT_BLUE, fill_type="solid"
-            )
-
-        # Create data cells
-        ws.cell(row=row_num, column=1, value=ts.get("user_name", ""))
-        ws.cell(
-            row=row_num,
-            column=2,
-            value=f"{ts.get('week_start', '')} - {ts.get('week_end', '')}",
         )
-        ws.cell(row=row_num, column=3, value=ts.get("timesheet_status", ""))
-        ws.cell(row=row_num, column=4, value=ts.get("total_hours", ""))
-
-        # Apply styling to all cells in the row
-        for col_num in range(1, 5):
-            cell = ws.cell(row=row_num, column=col_num)
-            cell.border = thin_border
-            cell.fill = row_fill
-
-            # Special alignment for user name (left aligned)
-            if col_num == 1:
-                cell.alignment = Alignment(horizontal="left", vertical="center")
-            else:
-                cell.alignment = Alignment(horizontal="center", vertical="center")
-
-    # Auto-adjust column widths (FIXED: Handle merged cells properly)
-    for col_idx, col in enumerate(ws.columns, 1):
-        max_length = 0
-        column_letter = None
-
-        # Find the column letter from a non-merged cell
-        for cell in col:
-            try:
-                # Skip merged cells that are not the top-left cell
-                if cell.coordinate in ws.merged_cells and cell.value is None:
-                    continue
+    )
 
-                if cell.value:
-                    max_length = max(max_length, len(str(cell.value)))
 
-                # Get column letter from any cell that's not a MergedCell
-                if not column_letter and hasattr(cell, "column_letter"):
-                    column_letter = cell.column_letter
-            except Exception as e:
-                continue
+def getTimesheetDayBatches(orgId, userId, role, timesheetData):
+    """
+    The days with hours or a note of the requested projects' entries on the
+    timesheets of the list, for the per-day export: rows of (code, user_name,
+    date, project_name, task_name, status, hours, note) from
+    timesheet_entry_days, ordered by week, user, entry and date, read with
+    yield_per.
+
+    Returns:
+        (iterator of lists of up to STREAM_BATCH_SIZE rows, error)
+    """
+    try:
+        query = _timesheetDaySelect(
+            orgId,
+            userId,
+            role,
+            timesheetData,
+            TimesheetSummary.code,
+            TimesheetSummary.user_name,
+            TimesheetEntryDay.date,
+            Project.name.label("project_name"),
+            Task.name.label("task_name"),
+            TimesheetEntry.status,
+            TimesheetEntryDay.hours,
+            TimesheetEntryDay.note,
+        ).order_by(
+            TimesheetSummary.week_start,
+            TimesheetSummary.user_name,
+            TimesheetEntry.id,
+            TimesheetEntryDay.date,
+        )
 
-        # If we couldn't get column_letter, calculate it from col_idx
-        if not column_letter:
-            column_letter = (
-                chr(64 + col_idx) if col_idx <= 26 else "A"
-            )  # Simple fallback
+        return db.session.execute(
+            query, execution_options={"yield_per": STREAM_BATCH_SIZE}
+        ).partitions(), None
 
-        # Add padding to column width
-        adjusted_width = min(max_length + 4, 50)  # Cap at 50 for very long content
+    except Exception as e:
+        return None, str(e)
 
-        # Only set width if we found content
-        if max_length > 0:
-            ws.column_dimensions[column_letter].width = adjusted_width
 
-    # Set specific column widths for better readability
-    ws.column_dimensions["A"].width = 25  # User Name
-    ws.column_dimensions["B"].width = 30  # Period
-    ws.column_dimensions["C"].width = 15  # Status
-    ws.column_dimensions["D"].width = 12  # Total Hours
+def countTimesheetDays(orgId, userId, role, timesheetData):
+    """
+    Number of rows of the per-day export (see getTimesheetDayBatches).
 
-    # Save to BytesIO to return as a file-like object
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
+    Returns:
+        (int, error)
+    """
+    try:
+        return db.session.execute(
+            _timesheetDaySelect(orgId, userId, role, timesheetData, func.count())
+        ).scalar_one(), None
 
-    return output, None
+    except Exception as e:
+        return None, str(e)
 
 
 def createHoliday(orgId, userId, holidayData):
@@ -492,7 +742,21 @@ def createHoliday(orgId, userId, holidayData):
             created_by=userId,
         )
         db.session.add(holiday)
+
+        # The details of the weeks containing the holiday change (is_holiday)
+        markTimesheetsChanged(
+            db.session.execute(
+                select(Timesheet.id)
+                .join(User, User.id == Timesheet.user_id)
+                .where(
+                    User.org_id == orgId,
+                    Timesheet.week_start <= holidayData["date"],
+                    Timesheet.week_end >= holidayData["date"],
+                )
+            ).scalars()
+        )
         db.session.commit()
+        invalidateHolidayCalendar(orgId, holiday.date.year)
 
         if not holiday.id:
             return None, "Project creation failed"
@@ -510,56 +774,63 @@ def createHoliday(orgId, userId, holidayData):
         return None, str(e)
 
 
-def getTimesheetByCode(userId, orgId, timesheet_code, userRole, action):
-    """
-    Fetch a timesheet by code and return all its entries along with history, project, task, etc.
+def getTimesheetNavigation(timesheetCode):
     """
+    The timesheet and the previous / next week of the same user in one
+    windowed query (LAG / LEAD over the user's weeks).
 
-    # userId, error = getIdFromCode(User, userCode)
-
-    if not timesheet_code:
-        return {"timesheet_data": [], "timesheet_status": None}, None
-
-    # Fetch the timesheet
-    timesheet = Timesheet.query.filter_by(code=timesheet_code).first()
+    Returns:
+        dict or None: id, user_id, code, version, status, total_hours,
+        week_start and week_end of the timesheet, and the same fields of
+        its neighbours prefixed with previous_ / next_ (None at the ends).
+    """
+    window = {"partition_by": Timesheet.user_id, "order_by": Timesheet.week_start}
+    weekColumns = {
+        "code": Timesheet.code,
+        "version": Timesheet.version,
+        "status": Timesheet.status,
+        "total_hours": TimesheetSummary.total_hours,
+        "week_start": Timesheet.week_start,
+        "week_end": Timesheet.week_end,
+    }
+    columns = [Timesheet.id, Timesheet.user_id]
+
+    for name, column in weekColumns.items():
+        columns += [
+            column.label(name),
+            func.lag(column, type_=column.type).over(**window).label(f"previous_{name}"),
+            func.lead(column, type_=column.type).over(**window).label(f"next_{name}"),
+        ]
 
-    # PREVIOUS timesheet
-    prevTimesheet = (
-        Timesheet.query.filter(
-            Timesheet.user_id == timesheet.user_id,
-            Timesheet.week_end < timesheet.week_start,
+    current = aliased(Timesheet)
+    userWeeks = (
+        select(*columns)
+        .outerjoin(TimesheetSummary, TimesheetSummary.timesheet_id == Timesheet.id)
+        .where(
+            Timesheet.user_id
+            == select(current.user_id).where(current.code == timesheetCode).scalar_subquery()
         )
-        .order_by(Timesheet.week_end.desc())
-        .limit(1)
-        .first()
+        .subquery()
     )
 
-    # NEXT timesheet
-    nextTimesheet = (
-        Timesheet.query.filter(
-            Timesheet.user_id == timesheet.user_id,
-            Timesheet.week_start > timesheet.week_end,
-        )
-        .order_by(Timesheet.week_start.asc())
-        .limit(1)
-        .first()
-    )
+    row = db.session.execute(
+        select(userWeeks).where(userWeeks.c.code == timesheetCode)
+    ).mappings().first()
 
-    if not timesheet:
-        return None, f"Timesheet with code {timesheet_code} not found"
+    return dict(row) if row else None
 
-    if timesheet.user_id != userId and userRole not in ["HR", "Super Admin", "Manager"]:
-        return None, "Not authorized to view particular timesheet"
 
-    result = []
+def _isEntryEditable(timesheet, entry, userId):
+    return timesheet.user_id == userId and entry.status in [
+        TIMESHEET_STATUS["DRAFT"],
+        TIMESHEET_STATUS["REJECTED"],
+    ]
 
-    holidays = Holiday.query.filter(
-        Holiday.org_id == orgId,
-        Holiday.date >= timesheet.week_start,
-        Holiday.date <= timesheet.week_end,
-    ).all()
-    holiday_dates = {h.date for h in holidays}
 
+def _timesheetDetails(timesheet, userId, userRole, action, orgId):
+    """Entries and history of a timesheet loaded with its detail graph."""
+    grid = weekGrid(orgId, timesheet.week_start)
+    result = []
     historyList = []
 
     for entry in timesheet.entries:
@@ -592,15 +863,6 @@ def getTimesheetByCode(userId, orgId, timesheet_code, userRole, action):
                 }
             )
 
-        for i, e in enumerate(entry.time_records):
-            day = timesheet.week_start + timedelta(days=i)
-            # if entry.status != TIMESHEET_STATUS["DRAFT"]:
-            e["is_editable"] = timesheet.user_id == userId and entry.status in [
-                TIMESHEET_STATUS["DRAFT"],
-                TIMESHEET_STATUS["REJECTED"],
-            ]
-            e["is_holiday"] = day in holiday_dates
-
         result.append(
             {
                 "timesheet_code": timesheet.code,
@@ -613,7 +875,11 @@ def getTimesheetByCode(userId, orgId, timesheet_code, userRole, action):
                 "week_end": timesheet.week_end.isoformat(),
                 # "week_start": formatDatetime(timesheet.week_start),
                 # "week_end": formatDatetime(timesheet.week_end),
-                "time_records": entry.time_records,
+                "time_records": expandTimeRecords(
+                    entry.time_records,
+                    grid,
+                    _isEntryEditable(timesheet, entry, userId),
+                ),
                 "status": entry.status_obj.name if entry.status_obj else None,
                 "comment": None,
                 "can_delete": (
@@ -647,19 +913,111 @@ def getTimesheetByCode(userId, orgId, timesheet_code, userRole, action):
             }
         )
 
-    timesheetStatus = timesheet.status_obj.name if timesheet.status_obj else None
-
     return {
         "timesheet_data": result,
         "history": historyList,
-        "timesheet_status": timesheetStatus,
+        "timesheet_status": timesheet.status_obj.name if timesheet.status_obj else None,
         "week_start": formatDatetime(timesheet.week_start),
         "week_end": formatDatetime(timesheet.week_end),
-        "previous_timesheet_code": (prevTimesheet.code if prevTimesheet else None),
-        "next_timesheet_code": nextTimesheet.code if nextTimesheet else None,
+    }
+
+
+def getTimesheetByCode(
+    userId,
+    orgId,
+    timesheet_code,
+    userRole,
+    action,
+    prefetchNeighbours=False,
+    navigation=None,
+):
+    """
+    Fetch a timesheet by code and return all its entries along with history, project, task, etc.
+
+    The previous / next week summaries come from getTimesheetNavigation
+    (pass it when the caller already ran it). With prefetchNeighbours the
+    neighbours carry their entries and history too, loaded by the same
+    statements as the timesheet's own.
+    """
+
+    if not timesheet_code:
+        return {"timesheet_data": [], "timesheet_status": None}, None
+
+    if navigation is None:
+        navigation = getTimesheetNavigation(timesheet_code)
+
+    if not navigation:
+        return None, f"Timesheet with code {timesheet_code} not found"
+
+    if navigation["user_id"] != userId and userRole not in ["HR", "Super Admin", "Manager"]:
+        return None, "Not authorized to view particular timesheet"
+
+    codes = [timesheet_code]
+
+    if prefetchNeighbours:
+        codes += [
+            code
+            for code in (navigation["previous_code"], navigation["next_code"])
+            if code
+        ]
+
+    # Fetch the timesheets with everything the response reads: one statement
+    # for the timesheets, one for their entries and one for the history,
+    # whatever the number of entries
+    timesheets = {
+        timesheet.code: timesheet
+        for timesheet in Timesheet.query.options(
+            joinedload(Timesheet.status_obj),
+            selectinload(Timesheet.entries).options(
+                joinedload(TimesheetEntry.project),
+                joinedload(TimesheetEntry.task),
+                joinedload(TimesheetEntry.status_obj),
+                selectinload(TimesheetEntry.history).options(
+                    joinedload(TimesheetHistory.old_status_obj),
+                    joinedload(TimesheetHistory.new_status_obj),
+                    joinedload(TimesheetHistory.changed_by_user),
+                ),
+            ),
+        ).filter(Timesheet.code.in_(codes))
+    }
+    timesheet = timesheets.get(timesheet_code)
+
+    if not timesheet:
+        return None, f"Timesheet with code {timesheet_code} not found"
+
+    statuses = timesheetStatuses()
+
+    def neighbour(prefix):
+        code = navigation[f"{prefix}_code"]
+
+        if code is None:
+            return None
+
+        data = {
+            "timesheet_code": code,
+            "timesheet_status": statuses.nameOf(navigation[f"{prefix}_status"]),
+            "total_hours": navigation[f"{prefix}_total_hours"] or 0,
+            "week_start": formatDatetime(navigation[f"{prefix}_week_start"]),
+            "week_end": formatDatetime(navigation[f"{prefix}_week_end"]),
+        }
+
+        if code in timesheets:
+            data.update(
+                _timesheetDetails(timesheets[code], userId, userRole, action, orgId)
+            )
+
+        return data
+
+    return {
+        **_timesheetDetails(timesheet, userId, userRole, action, orgId),
+        "previous_timesheet_code": navigation["previous_code"],
+        "next_timesheet_code": navigation["next_code"],
+        "previous_timesheet": neighbour("previous"),
+        "next_timesheet": neighbour("next"),
     }, None
 
 
+
 def copyTimesheetEntry(userId, orgId, timesheet_code):
     try:
 
@@ -672,13 +1030,6 @@ def copyTimesheetEntry(userId, orgId, timesheet_code):
         if timesheet.user_id != userId:
             return None, "Not authorized to copy entries"
 
-        holidays = Holiday.query.filter(
-            Holiday.org_id == orgId,
-            Holiday.date >= timesheet.week_start,
-            Holiday.date <= timesheet.week_end,
-        ).all()
-        holiday_dates = {h.date for h in holidays}
-
         prevTimesheet = (
             Timesheet.query.filter(
                 Timesheet.user_id == userId,
@@ -708,20 +1059,10 @@ def copyTimesheetEntry(userId, orgId, timesheet_code):
         for prev_entry in prevTimesheet.entries:
             # Check if entry already exists in current timesheet
 
-            # Prepare 7-day time_records
-            time_records = []
-            for i in range(7):
-                day = timesheet.week_start + timedelta(days=i)
-                time_records.append(
-                    {
-                        "date": day.isoformat(),
-                        "hours": prev_entry.time_records[i]["hours"],
-                        "note": prev_entry.time_records[i]["note"],
-                        "is_weekend": day.weekday() >= 5,
-                        "is_holiday": day in holiday_dates,
-                        "is_editable": True,
-                    }
-                )
+            # Same hours and notes, day by day
+            time_records = packTimeRecords(
+                weekHours(prev_entry.time_records), weekNotes(prev_entry.time_records)
+            )
 
             # Create new entry
             new_entry = TimesheetEntry(
@@ -758,13 +1099,15 @@ def createTimesheetEntry(userId, orgId, timesheetEntryData):
         timesheetId, timesheet_error = getIdFromCode(
             Timesheet, timesheetEntryData["timesheet_code"]
         )
+        if timesheet_error:
+            return None, timesheet_error
 
         # Fetch timesheet
-        timesheet = Timesheet.query.get(timesheetId)
+        timesheet = db.session.get(Timesheet, timesheetId)
         if not timesheet:
             return (
                 None,
-                f"Timesheet with id {timesheetEntryData['timesheet_id']} not found",
+                f"Timesheet with code {timesheetEntryData['timesheet_code']} not found",
             )
 
         if timesheet.user_id != userId:
@@ -776,8 +1119,8 @@ def createTimesheetEntry(userId, orgId, timesheetEntryData):
         )
         taskId, task_error = getIdFromCode(Task, timesheetEntryData["task_code"])
 
-        if project_error or task_error or timesheet_error:
-            return None, project_error or task_error or timesheet_error
+        if project_error or task_error:
+            return None, project_error or task_error
 
         # Check if entry already exists
         existing_entry = TimesheetEntry.query.filter_by(
@@ -790,27 +1133,8 @@ def createTimesheetEntry(userId, orgId, timesheetEntryData):
         # Fetch user organization for holidays
         # user = timesheet.user
 
-        holidays = Holiday.query.filter(
-            Holiday.org_id == orgId,
-            Holiday.date >= timesheet.week_start,
-            Holiday.date <= timesheet.week_end,
-        ).all()
-        holiday_dates = {h.date for h in holidays}
-
         # Prepare 7-day time_records
-        time_records = []
-        for i in range(7):
-            day = timesheet.week_start + timedelta(days=i)
-            time_records.append(
-                {
-                    "date": day.isoformat(),
-                    "hours": 0,
-                    "note": "",
-                    "is_weekend": day.weekday() >= 5,
-                    "is_holiday": day in holiday_dates,
-                    "is_editable": True,
-                }
-            )
+        time_records = packTimeRecords([0] * 7)
 
         # Create the entry
         entry = TimesheetEntry(
@@ -882,6 +1206,18 @@ def createTimesheetsForAllUsers():
 
         if timesheet_data:
             db.session.bulk_insert_mappings(Timesheet, timesheet_data)
+
+            # Bulk inserts fire no mapper events: record the new weeks so the
+            # commit adds their summary rows and bumps the data versions
+            markTimesheetsChanged(
+                db.session.execute(
+                    select(Timesheet.id).where(
+                        Timesheet.user_id.in_([row["user_id"] for row in timesheet_data]),
+                        Timesheet.week_start == week_start,
+                        Timesheet.week_end == week_end,
+                    )
+                ).scalars()
+            )
             db.session.commit()
 
         return f"Created {len(timesheet_data)} new timesheets successfully", None
@@ -924,13 +1260,15 @@ def deleteTimesheetEntry(userId, timesheetEntryData):
         return None, str(e)
 
 
-def updateTimesheets(userId, timesheetsData, userRole="Employee"):
+def updateTimesheets(userId, orgId, timesheetsData, userRole="Employee"):
     """
     Update hours and notes for multiple timesheet entries for a user.
     Expects timesheetsData to be a list of objects containing:
         - project_code
         - task_code
         - time_records: list of {"date": "YYYY-MM-DD", "hours": float, "note": str}
+          day patches; the days and fields left out are kept, and an entry
+          whose patches change nothing is not written
         - comment (optional, applies to the Timesheet)
     """
     try:
@@ -966,10 +1304,22 @@ def updateTimesheets(userId, timesheetsData, userRole="Employee"):
 
             # print(timesheet,"timesheet")
 
-            # Fetch or create TimesheetEntry
-            entry = TimesheetEntry.query.filter_by(
-                code=entryData["timesheet_entry_code"]
-            ).first()
+            # Fetch the entry with everything the response reads
+            entry = (
+                TimesheetEntry.query.options(
+                    joinedload(TimesheetEntry.timesheet).joinedload(Timesheet.status_obj),
+                    joinedload(TimesheetEntry.project),
+                    joinedload(TimesheetEntry.task),
+                )
+                .filter_by(code=entryData["timesheet_entry_code"])
+                .first()
+            )
+
+            if not entry:
+                responses.append(
+                    {"error": f"TimesheetEntry with code {entryData['timesheet_entry_code']} not found"}
+                )
+                continue
 
             timesheet = entry.timesheet
 
@@ -986,31 +1336,48 @@ def updateTimesheets(userId, timesheetsData, userRole="Employee"):
                 responses.append({"error": "time_records must be a list of objects"})
                 continue
 
-            updated_records_map = {str(r["date"]): r for r in updated_records}
+            grid = weekGrid(orgId, timesheet.week_start)
+            day_index = {day.date.isoformat(): i for i, day in enumerate(grid)}
 
-            total_hours = 0
+            hours = weekHours(entry.time_records)
+            notes = weekNotes(entry.time_records)
+            hours_delta = 0
+            changed = False
 
-            for i, record in enumerate(entry.time_records):
-                date_str = str(record["date"])
-                if date_str in updated_records_map:
-                    entry.time_records[i]["hours"] = updated_records_map[date_str].get(
-                        "hours", record["hours"]
-                    )
-                    entry.time_records[i]["note"] = updated_records_map[date_str].get(
-                        "note", record["note"]
-                    )
+            # Day-level patches: a day keeps what its patch leaves out, and a
+            # patch that restates the stored values is not a change
+            for record in updated_records:
+                i = day_index.get(str(record["date"]))
+                if i is None:
+                    continue
 
-                total_hours += entry.time_records[i]["hours"]
+                new_hours = record.get("hours", hours[i])
+                new_note = record.get("note", notes.get(i)) or None
 
-            TimesheetEntry.query.filter_by(id=entry.id).update(
-                {"time_records": entry.time_records, "hours": total_hours}
-            )
-            db.session.commit()
+                if new_hours != hours[i]:
+                    hours_delta += new_hours - hours[i]
+                    hours[i] = new_hours
+                    changed = True
+
+                if new_note != notes.get(i):
+                    notes[i] = new_note
+                    changed = True
+
+            time_records = entry.time_records
+
+            if changed:
+                # A new value (not an in-place change) so the unit of work
+                # sees it; the flush marks the timesheet changed
+                time_records = packTimeRecords(hours, notes)
+                entry.time_records = time_records
+                entry.hours = round(entry.hours + hours_delta, 6)
+                db.session.commit()
 
             if timesheetsData["action"] == "submit":
                 TimesheetEntry.query.filter_by(id=entry.id).update(
                     {"status": TIMESHEET_STATUS["PENDING_APPROVAL"]}
                 )
+                markTimesheetsChanged([entry.timesheet_id])
                 db.session.commit()
 
                 data = {
@@ -1029,7 +1396,9 @@ def updateTimesheets(userId, timesheetsData, userRole="Employee"):
                 "project_name": entry.project.name if entry.project else None,
                 "week_start": timesheet.week_start.isoformat(),
                 "week_end": timesheet.week_end.isoformat(),
-                "time_records": entry.time_records,
+                "time_records": expandTimeRecords(
+                    time_records, grid, _isEntryEditable(timesheet, entry, userId)
+                ),
                 "status": timesheet.status_obj.name if timesheet.status_obj else None,
                 # "comment": timesheet.comment,
             }
@@ -1038,6 +1407,7 @@ def updateTimesheets(userId, timesheetsData, userRole="Employee"):
         return responses, None
 
     except Exception as e:
+        db.session.rollback()
         return None, str(e)
 
 
@@ -1188,16 +1558,23 @@ def bulkReviewTimesheet(userId, userRole, timesheetData):
 
         is_admin = userRole in (ROLES["HR"], ROLES["SUPER_ADMIN"])
 
+        projectId, projectError = getIdFromCode(Project, timesheetData["project_code"])
+        if projectError:
+            return None, f"Invalid project code: {timesheetData['project_code']}"
+
+        # All timesheets of the batch in one query
+        timesheets = {
+            timesheet.code: timesheet
+            for timesheet in Timesheet.query.filter(
+                Timesheet.code.in_(timesheetData["timesheet_codes"])
+            ).all()
+        }
+
         for timesheetCode in timesheetData["timesheet_codes"]:
-            timesheet = Timesheet.query.filter_by(code=timesheetCode).first()
+            timesheet = timesheets.get(timesheetCode)
             if not timesheet:
                 return None, f"Invalid timesheet code: {timesheetCode}"
 
-            project = Project.query.filter_by(code=timesheetData["project_code"]).first()
-            if not project:
-                return None, f"Invalid project code: {timesheetData['project_code']}"
-            projectId = project.id
-
             # Fetch timesheet entries for this project
             timesheetEntries = TimesheetEntry.query.filter(
                 TimesheetEntry.timesheet_id == timesheet.id,
@@ -1206,7 +1583,7 @@ def bulkReviewTimesheet(userId, userRole, timesheetData):
             ).all()
 
             if not timesheetEntries:
-                return None, f"No entries found for timesheet {timesheetCode} in project {project.code}"
+                return None, f"No entries found for timesheet {timesheetCode} in project {timesheetData['project_code']}"
 
             # Process each timesheet entry
             for timesheetEntry in timesheetEntries:
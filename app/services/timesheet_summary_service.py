@@ -0,0 +1,250 @@
+from datetime import timedelta
+
+from sqlalchemy import delete, event, func, insert, inspect, select, update
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+from app.models.timesheets import (
+    Timesheet,
+    TimesheetEntry,
+    TimesheetEntryDay,
+    TimesheetSummary,
+    TimesheetSummaryProject,
+)
+from app.models.users import Organization, User
+from app.utils.time_records import weekHours, weekNotes
+
+
+# Upper bound on the number of timesheets refreshed by a single statement
+SUMMARY_BATCH_SIZE = 500
+
+
+def entryDayRows(entryId, timesheetId, weekStart, timeRecords):
+    """timesheet_entry_days rows of an entry: its days with hours or a note."""
+    notes = weekNotes(timeRecords)
+
+    return [
+        {
+            "entry_id": entryId,
+            "date": weekStart + timedelta(days=day),
+            "timesheet_id": timesheetId,
+            "hours": float(hours),
+            "note": notes.get(day),
+        }
+        for day, hours in enumerate(weekHours(timeRecords))
+        if hours or day in notes
+    ]
+
+
+def refreshTimesheetEntryDays(session, timesheetIds):
+    """Rewrite the timesheet_entry_days rows of the given timesheets from time_records."""
+    days = TimesheetEntryDay.__table__
+
+    session.execute(delete(days).where(days.c.timesheet_id.in_(timesheetIds)))
+
+    rows = [
+        row
+        for entry in session.execute(
+            select(
+                TimesheetEntry.id,
+                TimesheetEntry.timesheet_id,
+                Timesheet.week_start,
+                TimesheetEntry.time_records,
+            )
+            .join(Timesheet, Timesheet.id == TimesheetEntry.timesheet_id)
+            .where(TimesheetEntry.timesheet_id.in_(timesheetIds))
+        )
+        for row in entryDayRows(*entry)
+    ]
+
+    if rows:
+        session.execute(insert(days), rows)
+
+
+def refreshTimesheetSummaries(session, timesheetIds):
+    """
+    Recompute the timesheet_summary / timesheet_summary_projects /
+    timesheet_entry_days rows of the given timesheets from the source tables,
+    inside the session's current transaction (so they commit or roll back
+    together with the write).
+    """
+    timesheetIds = sorted(set(timesheetIds))
+    summary = TimesheetSummary.__table__
+    summaryProjects = TimesheetSummaryProject.__table__
+
+    for start in range(0, len(timesheetIds), SUMMARY_BATCH_SIZE):
+        batch = timesheetIds[start:start + SUMMARY_BATCH_SIZE]
+
+        session.execute(delete(summaryProjects).where(summaryProjects.c.timesheet_id.in_(batch)))
+        session.execute(delete(summary).where(summary.c.timesheet_id.in_(batch)))
+
+        session.execute(
+            insert(summary).from_select(
+                [
+                    "timesheet_id",
+                    "code",
+                    "org_id",
+                    "user_id",
+                    "user_name",
+                    "week_start",
+                    "week_end",
+                    "status",
+                    "total_hours",
+                ],
+                select(
+                    Timesheet.id,
+                    Timesheet.code,
+                    User.org_id,
+                    Timesheet.user_id,
+                    User.full_name,
+                    Timesheet.week_start,
+                    Timesheet.week_end,
+                    Timesheet.status,
+                    func.coalesce(func.sum(TimesheetEntry.hours), 0),
+                )
+                .join(User, User.id == Timesheet.user_id)
+                .outerjoin(TimesheetEntry, TimesheetEntry.timesheet_id == Timesheet.id)
+                .where(Timesheet.id.in_(batch))
+                .group_by(
+                    Timesheet.id,
+                    Timesheet.code,
+                    User.org_id,
+                    Timesheet.user_id,
+                    User.full_name,
+                    Timesheet.week_start,
+                    Timesheet.week_end,
+                    Timesheet.status,
+                ),
+            )
+        )
+
+        session.execute(
+            insert(summaryProjects).from_select(
+                ["timesheet_id", "project_id", "hours"],
+                select(
+                    TimesheetEntry.timesheet_id,
+                    TimesheetEntry.project_id,
+                    func.sum(TimesheetEntry.hours),
+                )
+                .where(
+                    TimesheetEntry.timesheet_id.in_(batch),
+                    TimesheetEntry.project_id.isnot(None),
+                )
+                .group_by(TimesheetEntry.timesheet_id, TimesheetEntry.project_id),
+            )
+        )
+
+        refreshTimesheetEntryDays(session, batch)
+
+
+def rebuildTimesheetSummaries(batchSize=SUMMARY_BATCH_SIZE):
+    """
+    Rebuild the whole read model from the source tables, committing per batch.
+
+    Returns:
+        int: Number of timesheets summarized.
+    """
+    summary = TimesheetSummary.__table__
+    summaryProjects = TimesheetSummaryProject.__table__
+    days = TimesheetEntryDay.__table__
+
+    # Rows of timesheets that no longer exist
+    db.session.execute(delete(days).where(days.c.timesheet_id.not_in(select(Timesheet.id))))
+    db.session.execute(
+        delete(summaryProjects).where(
+            summaryProjects.c.timesheet_id.not_in(select(Timesheet.id))
+        )
+    )
+    db.session.execute(
+        delete(summary).where(summary.c.timesheet_id.not_in(select(Timesheet.id)))
+    )
+    db.session.commit()
+
+    total = 0
+    lastId = 0
+
+    while True:
+        timesheetIds = db.session.execute(
+            select(Timesheet.id)
+            .where(Timesheet.id > lastId)
+            .order_by(Timesheet.id)
+            .limit(batchSize)
+        ).scalars().all()
+
+        if not timesheetIds:
+            return total
+
+        refreshTimesheetSummaries(db.session, timesheetIds)
+        db.session.commit()
+
+        total += len(timesheetIds)
+        lastId = timesheetIds[-1]
+
+
+def checkTimesheetSummaries(limit=20):
+    """
+    Compare the read model with the timesheets: every timesheet needs its
+    timesheet_summary row (the timesheet lists only read the summary), and
+    no summary row may outlive its timesheet.
+
+    Returns:
+        (list, list): Up to limit ids of the timesheets without a summary
+        row, and of the summary rows without a timesheet.
+    """
+    summary = TimesheetSummary.__table__
+
+    missing = db.session.execute(
+        select(Timesheet.id)
+        .where(Timesheet.id.not_in(select(summary.c.timesheet_id)))
+        .order_by(Timesheet.id)
+        .limit(limit)
+    ).scalars().all()
+
+    orphans = db.session.execute(
+        select(summary.c.timesheet_id)
+        .where(summary.c.timesheet_id.not_in(select(Timesheet.id)))
+        .order_by(summary.c.timesheet_id)
+        .limit(limit)
+    ).scalars().all()
+
+    return missing, orphans
+
+
+@event.listens_for(User, "after_update")
+def _onUserRenamed(mapper, connection, target):
+    state = inspect(target)
+    orgHistory = state.attrs.org_id.history
+
+    if state.attrs.full_name.history.has_changes() or orgHistory.has_changes():
+        state.session.info.setdefault("renamed_summary_users", {})[target.id] = (
+            target.full_name,
+            target.org_id,
+            # Both organizations' timesheet lists change
+            {target.org_id, *orgHistory.deleted},
+        )
+
+
+@event.listens_for(Session, "before_commit")
+@event.listens_for(Session, "after_flush_postexec")
+def _applyUserRenames(session, *args):
+    summary = TimesheetSummary.__table__
+    organizations = Organization.__table__
+
+    for userId, (fullName, orgId, changedOrgIds) in session.info.pop(
+        "renamed_summary_users", {}
+    ).items():
+        session.execute(
+            update(summary)
+            .where(summary.c.user_id == userId)
+            .values(user_name=fullName, org_id=orgId)
+        )
+        session.execute(
+            update(organizations)
+            .where(organizations.c.id.in_(changedOrgIds))
+            .values(timesheet_version=organizations.c.timesheet_version + 1)
+        )
+
+
+@event.listens_for(Session, "after_rollback")
+def _onSummaryRolledBack(session):
+    session.info.pop("renamed_summary_users", None)
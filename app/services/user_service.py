@@ -1,26 +1,54 @@
-from sqlalchemy import or_
+import os
+
+from sqlalchemy import event, func, inspect, or_
+from sqlalchemy.orm import Session
 from app.constants.lookups import DB_ROLE_ID, EMAIL_SUBJECTS, ROLES
 from app.extensions import db
 from app.models import User, UserRole, Project, UserProject
-from app.models.timesheets import TimesheetStatus
 from app.models.users import Organization
-from app.services.common_service import getIdFromCode
+from app.services.common_service import getIdFromCode, getIdsFromCodes
+from app.services.lookup_service import timesheetStatuses, userRoles
+from app.services.search_service import userSearchCandidates
 from sqlalchemy.exc import SQLAlchemyError
 
 
 from app.services.timesheet_service import createTimesheetsForAllUsers
+from app.utils.cache import LRUCache
 from app.utils.helpers import (
     formatDatetime,
     generateRefreshToken,
     generateToken,
     generatepwd,
     hashPassword,
+    STREAM_BATCH_SIZE,
+    paginateKeyset,
     paginateQuery,
+    selectFields,
     sendEmailFromTemplate,
     verifyPassword,
 )
 
 
+# user_code -> (role name, user id, org id), read by authorize() on every call
+principalCache = LRUCache(
+    "principal",
+    maxsize=int(os.getenv("PRINCIPAL_CACHE_SIZE", "4096")),
+    ttl=int(os.getenv("PRINCIPAL_CACHE_TTL", "300")),
+)
+
+# user_code -> latest authz_version, used to reject tokens whose signed
+# claims predate a role/org/is_active change. The TTL bounds how long another
+# process's change can go unnoticed here.
+authzVersionCache = LRUCache(
+    "authz_version",
+    maxsize=int(os.getenv("PRINCIPAL_CACHE_SIZE", "4096")),
+    ttl=int(os.getenv("AUTHZ_VERSION_CACHE_TTL", "30")),
+)
+
+# User columns that change what authorize() resolves for a user
+PRINCIPAL_ATTRIBUTES = ("role_id", "org_id", "is_active")
+
+
 def userLogin(email, password):
     """
     Authenticate a user by email and password.
@@ -32,7 +60,16 @@ def userLogin(email, password):
     if not user:
         return None, "User not found"
 
-    accessToken = generateToken(user.code, user.role.code, user.organization.code)
+    accessToken = generateToken(
+        user.code,
+        user.role.code,
+        user.organization.code,
+        userId=user.id,
+        orgId=user.org_id,
+        roleName=user.role.name,
+        authzVersion=user.authz_version,
+    )
+    authzVersionCache.set(user.code, user.authz_version)
     refreshToken = generateRefreshToken(user.code)
 
     data = {
@@ -54,27 +91,100 @@ def userLogin(email, password):
 def getUserAssignedRole(userCode):
     """
     Retrieve the role assigned to a user using their unique code.
-    Will be called on every API from decorator
+    Will be called on every API from decorator, so the result is served
+    from principalCache and only hits the database on a miss.
     """
 
+    principal = principalCache.get(userCode)
+    if principal:
+        return principal + (None,)
+
     try:
-        role_name = (
-            db.session.query(UserRole.name, User.id, Organization.id.label("org_id"))
-            .join(User, User.role_id == UserRole.id)
-            .join(Organization, User.org_id == Organization.id)
+        user = (
+            db.session.query(User.id, User.org_id, User.role_id, User.authz_version)
             .filter(User.code == userCode)
             .first()
         )
 
-        if not role_name:
-            return None, None, "Role not found or user not found"
+        roleName = userRoles().nameOf(user.role_id) if user else None
 
-        return role_name.name, role_name.id, role_name.org_id, None
+        if not roleName:
+            return None, None, None, "Role not found or user not found"
+
+        principal = (roleName, user.id, user.org_id)
+        principalCache.set(userCode, principal)
+        authzVersionCache.set(userCode, user.authz_version)
+
+        return principal + (None,)
 
     except Exception as e:
         return None, None, None, str(e)
 
 
+def invalidateUserPrincipal(userCode):
+    """
+    Drop the cached principal of a user.
+    Must be called whenever the user's role, organization or is_active flag changes
+    outside of the ORM unit of work (e.g. bulk query.update()).
+    """
+    principalCache.invalidate(userCode)
+
+
+def isAuthzVersionCurrent(userCode, userId, authzVersion):
+    """
+    Check the authz_version claim of a token against the user's current
+    version: from authzVersionCache, or on a miss by a primary key lookup
+    that is cached for AUTHZ_VERSION_CACHE_TTL. A changed user is rejected
+    at once by the process that made the change and within the TTL
+    elsewhere; a user that no longer exists is rejected.
+    """
+    latestVersion = authzVersionCache.get(userCode)
+
+    if latestVersion is None:
+        try:
+            latestVersion = (
+                db.session.query(User.authz_version)
+                .filter(User.id == userId, User.code == userCode)
+                .scalar()
+            )
+        except Exception:
+            return False
+
+        if latestVersion is None:
+            return False
+
+        authzVersionCache.set(userCode, latestVersion)
+
+    return authzVersion >= latestVersion
+
+
+@event.listens_for(User, "before_update")
+def _bumpAuthzVersion(mapper, connection, target):
+    state = inspect(target)
+
+    if any(state.attrs[attr].history.has_changes() for attr in PRINCIPAL_ATTRIBUTES):
+        target.authz_version = (target.authz_version or 0) + 1
+
+
+@event.listens_for(User, "after_update")
+def _onUserUpdated(mapper, connection, target):
+    state = inspect(target)
+
+    if any(state.attrs[attr].history.has_changes() for attr in PRINCIPAL_ATTRIBUTES):
+        invalidateUserPrincipal(target.code)
+
+        # Invalidate again once committed, so a request that re-reads the old
+        # row before the commit cannot leave a stale principal behind
+        state.session.info.setdefault("stale_principals", {})[target.code] = target.authz_version
+
+
+@event.listens_for(Session, "after_commit")
+def _onSessionCommitted(session):
+    for userCode, authzVersion in session.info.pop("stale_principals", {}).items():
+        invalidateUserPrincipal(userCode)
+        authzVersionCache.set(userCode, authzVersion)
+
+
 def getUserRoles():
     """
     Fetch a list of all available roles except SUPER_ADMIN.
@@ -85,18 +195,15 @@ def getUserRoles():
         # roles = UserRole.query.all()
         SUPER_ADMIN_CODE = "5d5f9f52-7ac1-4c1c-b9a1-2e6d2eb8f441"
 
-        roles = UserRole.query.filter(UserRole.code != SUPER_ADMIN_CODE).all()
-
-        roleList = []
-
-        for role in roles:
-            roleList.append(
-                {
-                    "value": role.code,
-                    "label": role.name,
-                    "description": role.description,
-                }
-            )
+        roleList = [
+            {
+                "value": role.code,
+                "label": role.name,
+                "description": role.description,
+            }
+            for role in userRoles().rows
+            if role.code != SUPER_ADMIN_CODE
+        ]
 
         return roleList, None
 
@@ -218,33 +325,64 @@ def resetUserPassword(userData):
         return None, str(e)
 
 
-def getUsers(variant, search="", page=1, per_page=10):
+# Fields of the user list (the fields= whitelist) and how each is serialized
+USER_LIST_FIELDS = {
+    "code": lambda user, roles: user.code,
+    "name": lambda user, roles: user.full_name,
+    "email": lambda user, roles: user.email,
+    "is_active": lambda user, roles: user.is_active,
+    "created_at": lambda user, roles: user.created_at,
+    "updated_at": lambda user, roles: user.updated_at,
+    "org_name": lambda user, roles: user.org_name,
+    "role": lambda user, roles: roles.nameOf(user.role_id),
+}
+
+
+def getUsers(
+    variant,
+    search="",
+    page=1,
+    per_page=10,
+    pagination="offset",
+    cursor=None,
+    selectedFields=None,
+    stream=False,
+):
     """
     Retrieve a paginated list of users.
     Includes metadata: page, per_page, total, total_pages.
+    With pagination="cursor" the metadata is per_page, next_cursor, has_more instead.
+    selectedFields (comma separated) limits the columns fetched and returned.
+    With stream=True the "all" variant returns a generator reading the users
+    in batches (yield_per), to be sent with streamSuccessMessage.
     """
     try:
+        roles = userRoles()
+        fieldNames = selectFields(selectedFields, USER_LIST_FIELDS)
+
+        columns = {
+            "code": User.code,
+            "name": User.full_name,
+            "email": User.email,
+            "is_active": User.is_active,
+            "created_at": User.created_at,
+            "updated_at": User.updated_at,
+            "org_name": Organization.name.label("org_name"),
+            "role": User.role_id,
+        }
 
         # query = User.query.order_by(User.created_at.desc())
-        query = (
-            db.session.query(
-                User.code,
-                User.full_name,
-                User.email,
-                User.is_active,
-                User.created_at,
-                User.updated_at,
-                Organization.name.label("org_name"),
-                UserRole.name.label("role_name"),
-            )
-            .outerjoin(Organization, User.org_id == Organization.id)
-            .outerjoin(UserRole, User.role_id == UserRole.id)
-            .order_by(User.full_name.asc())
-        )
+        query = db.session.query(*(columns[name] for name in fieldNames)).select_from(User)
+
+        if "org_name" in fieldNames:
+            query = query.outerjoin(Organization, User.org_id == Organization.id)
+
+        query = query.order_by(User.full_name.asc())
 
         if search:
             search_term = f"%{search}%"
             query = query.filter(
+                User.id.in_(userSearchCandidates(search)),
                 or_(
                     User.full_name.ilike(search_term),
                     User.email.ilike(search_term),
@@ -253,67 +391,54 @@ def getUsers(variant, search="", page=1, per_page=10):
 
         if variant == "paginated":
 
-            users, meta = paginateQuery(query, page, per_page)
-            userList = []
-
-            for user in users:
-                userList.append(
-                    {
-                        "code": user.code,
-                        "name": user.full_name,
-                        "email": user.email,
-                        "is_active": user.is_active,
-                        "created_at": user.created_at,
-                        "updated_at": user.updated_at,
-                        "org_name": user.org_name,
-                        "role": user.role_name,
-                    }
+            if pagination == "cursor":
+                users, meta = paginateKeyset(
+                    query,
+                    [func.coalesce(User.full_name, ""), User.id],
+                    cursor=cursor,
+                    per_page=per_page,
                 )
+            else:
+                users, meta = paginateQuery(query, page, per_page)
+
+            userList = [
+                {name: USER_LIST_FIELDS[name](user, roles) for name in fieldNames}
+                for user in users
+            ]
 
             return {"users": userList, "meta": meta}, None
 
         if variant == "all":
+
+            if stream:
+                users = query.yield_per(STREAM_BATCH_SIZE)
+
+                return (
+                    {name: USER_LIST_FIELDS[name](user, roles) for name in fieldNames}
+                    for user in users
+                ), None
+
             users = query.all()
-            userList = []
-
-            for user in users:
-                userList.append(
-                    {
-                        "code": user.code,
-                        "name": user.full_name,
-                        "email": user.email,
-                        "is_active": user.is_active,
-                        "created_at": user.created_at,
-                        "updated_at": user.updated_at,
-                        "org_name": user.org_name,
-                        "role": user.role_name,
-                    }
-                )
+
+            userList = [
+                {name: USER_LIST_FIELDS[name](user, roles) for name in fieldNames}
+                for user in users
+            ]
 
             return userList, None
 
         if variant == "manager":
 
             query = query.filter(
-                UserRole.id.in_([DB_ROLE_ID["MANAGER"], DB_ROLE_ID["SUPER_ADMIN"]])
+                User.role_id.in_([DB_ROLE_ID["MANAGER"], DB_ROLE_ID["SUPER_ADMIN"]])
             )
 
             users = query.order_by(User.full_name.asc()).all()
-            userList = []
-
-            for user in users:
-                userList.append(
-                    {
-                        "code": user.code,
-                        "name": user.full_name,
-                        "email": user.email,
-                        "is_active": user.is_active,
-                        "created_at": user.created_at,
-                        "updated_at": user.updated_at,
-                        "org_name": user.org_name,
-                        "role": user.role_name,
-                    }
-                )
+
+            userList = [
+                {name: USER_LIST_FIELDS[name](user, roles) for name in fieldNames}
+                for user in users
+            ]
 
             return userList, None
 
@@ -505,17 +630,29 @@ def manageUserProject(authorUserId, projectData):
         results = []
         errors = []
 
+        userIds, missingCodes, userError = getIdsFromCodes(User, projectData["user_code"])
+        if userError:
+            return None, userError
+
+        # Existing assignments of these users to the project, fetched once
+        userProjects = {
+            userProject.user_id: userProject
+            for userProject in UserProject.query.filter(
+                UserProject.project_id == projectId,
+                UserProject.user_id.in_(list(userIds.values())),
+            ).all()
+        } if userIds else {}
+
         for user_code in projectData["user_code"]:  # loop over array
-            userId, userError = getIdFromCode(User, user_code)
-            if userError:
-                errors.append({user_code: userError})
+            if user_code in missingCodes:
+                errors.append({user_code: f"User with code '{user_code}' not found."})
                 continue
 
+            userId = userIds[user_code]
+
             if projectData["action"] == "assign":
                 # Prevent duplicate assignment
-                if UserProject.query.filter_by(
-                    user_id=userId, project_id=projectId
-                ).first():
+                if userId in userProjects:
                     errors.append({user_code: "User already exists in the project."})
                     continue
 
@@ -527,6 +664,7 @@ def manageUserProject(authorUserId, projectData):
                 )
                 db.session.add(userProject)
                 db.session.commit()
+                userProjects[userId] = userProject
 
                 if not userProject.id:
                     errors.append({user_code: "Project creation failed"})
@@ -535,9 +673,7 @@ def manageUserProject(authorUserId, projectData):
                 results.append({user_code: "Assigned successfully"})
 
             elif projectData["action"] == "status_change":
-                userProject = UserProject.query.filter_by(
-                    user_id=userId, project_id=projectId
-                ).first()
+                userProject = userProjects.get(userId)
                 if not userProject:
                     errors.append({user_code: "Project not exists"})
                     continue
@@ -567,7 +703,6 @@ def lookup(userCode, userRole):
 
     try:
 
-        timesheetStatus = TimesheetStatus.query.all()
         # userProjects, error = getUserProjects(userCode, userRole)
 
         query = Project.query
@@ -596,15 +731,28 @@ def lookup(userCode, userRole):
             for project in userProjects
         ]
 
+        # Static lookups are served from memory
         timesheetStatusList = [
             {
                 "value": ts.code,
                 "label": ts.name,
             }
-            for ts in timesheetStatus
+            for ts in timesheetStatuses().rows
+        ]
+
+        userRoleList = [
+            {
+                "value": role.code,
+                "label": role.name,
+            }
+            for role in userRoles().rows
         ]
 
-        return {"timesheet_status": timesheetStatusList, "projects": projectsList}, None
+        return {
+            "timesheet_status": timesheetStatusList,
+            "user_roles": userRoleList,
+            "projects": projectsList,
+        }, None
 
     except Exception as e:
         return None, str(e)
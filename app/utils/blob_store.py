@@ -0,0 +1,141 @@
+from abc import ABC, abstractmethod
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+
+class BlobStore(ABC):
+    """
+    Minimal key -> bytes store the exports are kept in. Keys are relative,
+    '/' separated paths. Backends implement every abstract method.
+    """
+
+    @abstractmethod
+    def put(self, key, fileobj):
+        """Store the content of a binary file object (read from its current position)."""
+
+    @abstractmethod
+    def open(self, key):
+        """Binary file object of a blob; raises KeyError if it does not exist."""
+
+    @abstractmethod
+    def delete(self, key):
+        """Remove a blob; missing keys are ignored."""
+
+    @abstractmethod
+    def exists(self, key):
+        """Whether a blob exists."""
+
+    @abstractmethod
+    def touch(self, key):
+        """Mark a blob as used now (its last access time)."""
+
+    @abstractmethod
+    def listBlobs(self, prefix):
+        """(key, size in bytes, last access timestamp) of the blobs under prefix."""
+
+
+class LocalBlobStore(BlobStore):
+    """Blobs as files under a root directory, so exports work without any cloud storage."""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def _path(self, key):
+        path = os.path.abspath(os.path.join(self.root, key))
+
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid blob key: {key}")
+
+        return path
+
+    def put(self, key, fileobj):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Written next to the target and renamed, so readers never see a partial blob
+        fd, tmpPath = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+
+        try:
+            with os.fdopen(fd, "wb") as target:
+                shutil.copyfileobj(fileobj, target)
+
+            os.replace(tmpPath, path)
+        except BaseException:
+            os.unlink(tmpPath)
+            raise
+
+    def open(self, key):
+        try:
+            return open(self._path(key), "rb")
+        except FileNotFoundError:
+            raise KeyError(key)
+
+    def delete(self, key):
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def exists(self, key):
+        return os.path.isfile(self._path(key))
+
+    def touch(self, key):
+        now = time.time()
+
+        try:
+            os.utime(self._path(key), (now, now))
+        except FileNotFoundError:
+            pass
+
+    def listBlobs(self, prefix):
+        directory = self._path(prefix)
+
+        if not os.path.isdir(directory):
+            return
+
+        for dirPath, _, fileNames in os.walk(directory):
+            for fileName in fileNames:
+                if fileName.startswith(".tmp-"):
+                    continue
+
+                path = os.path.join(dirPath, fileName)
+
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+
+                key = os.path.relpath(path, self.root).replace(os.sep, "/")
+                # mtime, set by put / touch: atime is unreliable (noatime mounts)
+                yield key, stat.st_size, stat.st_mtime
+
+
+# EXPORT_BLOB_STORE value -> factory of the backend
+BLOB_STORES = {
+    "local": lambda: LocalBlobStore(
+        os.getenv("EXPORT_BLOB_DIR", os.path.join(tempfile.gettempdir(), "timesheet-exports"))
+    ),
+}
+
+_blobStore = None
+_blobStoreLock = threading.Lock()
+
+
+def registerBlobStore(name, factory):
+    """Make a backend selectable with EXPORT_BLOB_STORE=name."""
+    BLOB_STORES[name] = factory
+
+
+def getBlobStore():
+    """The process wide blob store selected by EXPORT_BLOB_STORE (default "local")."""
+    global _blobStore
+
+    if _blobStore is None:
+        with _blobStoreLock:
+            if _blobStore is None:
+                _blobStore = BLOB_STORES[os.getenv("EXPORT_BLOB_STORE", "local")]()
+
+    return _blobStore
@@ -0,0 +1,115 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+# Every cache created in the process, by name (used for the stats endpoint)
+_registry = {}
+
+
+class LRUCache:
+    """
+    Thread-safe, size-bounded LRU cache with an optional TTL.
+
+    The cache is process local (one per Lambda container / worker), so it must
+    only hold values that are either immutable or invalidated explicitly by
+    the code paths that change them.
+
+    Args:
+        name (str): Name used when reporting stats.
+        maxsize (int): Maximum number of entries before the least recently
+            used one is evicted.
+        ttl (float): Default time to live of an entry in seconds (None = no expiry).
+    """
+
+    def __init__(self, name, maxsize=1024, ttl=None):
+        self.name = name
+        self.maxsize = max(1, int(maxsize))
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+        _registry[name] = self
+
+    def _expiresAt(self, ttl):
+        if ttl is None:
+            ttl = self.ttl
+        elif self.ttl is not None:
+            ttl = min(ttl, self.ttl)
+
+        return None if ttl is None else time.monotonic() + ttl
+
+    def get(self, key, default=None):
+        """Return the cached value (refreshing its LRU position) or default."""
+        with self._lock:
+            item = self._data.get(key)
+
+            if item is not None and item[1] is not None and item[1] <= time.monotonic():
+                del self._data[key]
+                item = None
+
+            if item is None:
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def peek(self, key, default=None):
+        """Return the cached value without touching the counters or LRU order."""
+        with self._lock:
+            item = self._data.get(key)
+
+            if item is None or (item[1] is not None and item[1] <= time.monotonic()):
+                return default
+
+            return item[0]
+
+    def set(self, key, value, ttl=None):
+        """
+        Store a value. A per entry ttl can only shorten the default TTL.
+        """
+        with self._lock:
+            self._data[key] = (value, self._expiresAt(ttl))
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def invalidateWhere(self, predicate):
+        """Drop every entry whose key matches predicate(key)."""
+        with self._lock:
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+def getCacheStats():
+    """Return the hit/miss counters of every cache in this process."""
+    return {name: cache.stats() for name, cache in _registry.items()}
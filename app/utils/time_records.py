@@ -0,0 +1,66 @@
+"""
+Storage format of TimesheetEntry.time_records:
+
+    {"h": [hours of the 7 days, Monday first], "n": {"<day index>": note}}
+
+The date and is_weekend of a day follow from the timesheet's week_start, and
+is_holiday / is_editable are computed when a timesheet is read, so only the
+hours and the non-empty notes are stored. Rows written before this format
+hold the expanded list of day objects; every reader here accepts both.
+"""
+
+DAYS_PER_WEEK = 7
+
+
+def packTimeRecords(hours, notes=None):
+    """Stored time_records of a week from its 7 hours and {day index: note}."""
+    return {
+        "h": [value or 0 for value in hours],
+        "n": {str(day): note for day, note in sorted((notes or {}).items()) if note},
+    }
+
+
+def weekHours(timeRecords):
+    """The 7 hours of stored time_records (compact or expanded)."""
+    if isinstance(timeRecords, dict):
+        hours = list(timeRecords.get("h") or [])
+    else:
+        hours = [record.get("hours") for record in timeRecords or []]
+
+    hours += [0] * (DAYS_PER_WEEK - len(hours))
+
+    return [value or 0 for value in hours[:DAYS_PER_WEEK]]
+
+
+def weekNotes(timeRecords):
+    """{day index: note} of the days of stored time_records that have a note."""
+    if isinstance(timeRecords, dict):
+        return {int(day): note for day, note in (timeRecords.get("n") or {}).items() if note}
+
+    return {day: record["note"] for day, record in enumerate(timeRecords or []) if record.get("note")}
+
+
+def compactTimeRecords(timeRecords):
+    """Stored time_records in the compact format, whatever their current one."""
+    return packTimeRecords(weekHours(timeRecords), weekNotes(timeRecords))
+
+
+def expandTimeRecords(timeRecords, weekDays, isEditable=True):
+    """
+    The API shape of stored time_records: one object per day of weekDays
+    (the week grid of the timesheet, see holiday_calendar_service.weekGrid).
+    """
+    hours = weekHours(timeRecords)
+    notes = weekNotes(timeRecords)
+
+    return [
+        {
+            "date": day.date.isoformat(),
+            "hours": hours[index],
+            "note": notes.get(index, ""),
+            "is_weekend": day.is_weekend,
+            "is_holiday": day.is_holiday,
+            "is_editable": isEditable,
+        }
+        for index, day in enumerate(weekDays)
+    ]
@@ -0,0 +1,87 @@
+"""added timesheet summary tables
+
+Revision ID: 5c1e8f3a9d27
+Revises: 3b7d2e91a4c6
+Create Date: 2026-10-18 17:05:12.418230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c1e8f3a9d27'
+down_revision = '3b7d2e91a4c6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('timesheet_summary',
+    sa.Column('timesheet_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('code', sa.String(length=36), nullable=False),
+    sa.Column('org_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('user_name', sa.String(length=200), nullable=True),
+    sa.Column('week_start', sa.Date(), nullable=False),
+    sa.Column('week_end', sa.Date(), nullable=False),
+    sa.Column('status', sa.Integer(), nullable=False),
+    sa.Column('total_hours', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['org_id'], ['organizations.id'], ),
+    sa.ForeignKeyConstraint(['status'], ['timesheet_status.id'], ),
+    sa.ForeignKeyConstraint(['timesheet_id'], ['timesheets.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('timesheet_id'),
+    sa.UniqueConstraint('code')
+    )
+    with op.batch_alter_table('timesheet_summary', schema=None) as batch_op:
+        batch_op.create_index('ix_timesheet_summary_org_week', ['org_id', 'week_start'], unique=False)
+        batch_op.create_index('ix_timesheet_summary_user_week', ['user_id', 'week_start'], unique=False)
+        batch_op.create_index('ix_timesheet_summary_week', ['week_start', 'week_end'], unique=False)
+
+    op.create_table('timesheet_summary_projects',
+    sa.Column('timesheet_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('project_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('hours', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ),
+    sa.ForeignKeyConstraint(['timesheet_id'], ['timesheets.id'], ),
+    sa.PrimaryKeyConstraint('timesheet_id', 'project_id')
+    )
+    with op.batch_alter_table('timesheet_summary_projects', schema=None) as batch_op:
+        batch_op.create_index('ix_timesheet_summary_projects_project', ['project_id', 'timesheet_id'], unique=False)
+
+    # Backfill from the existing timesheets (same as `flask rebuild-timesheet-summary`)
+    op.execute(
+        """
+        INSERT INTO timesheet_summary
+            (timesheet_id, code, org_id, user_id, user_name, week_start, week_end, status, total_hours)
+        SELECT t.id, t.code, u.org_id, t.user_id, u.full_name, t.week_start, t.week_end, t.status,
+               COALESCE(SUM(e.hours), 0)
+        FROM timesheets t
+        JOIN users u ON u.id = t.user_id
+        LEFT JOIN timesheet_entries e ON e.timesheet_id = t.id
+        GROUP BY t.id, t.code, u.org_id, t.user_id, u.full_name, t.week_start, t.week_end, t.status
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO timesheet_summary_projects (timesheet_id, project_id, hours)
+        SELECT e.timesheet_id, e.project_id, SUM(e.hours)
+        FROM timesheet_entries e
+        WHERE e.project_id IS NOT NULL
+        GROUP BY e.timesheet_id, e.project_id
+        """
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('timesheet_summary_projects', schema=None) as batch_op:
+        batch_op.drop_index('ix_timesheet_summary_projects_project')
+
+    op.drop_table('timesheet_summary_projects')
+    with op.batch_alter_table('timesheet_summary', schema=None) as batch_op:
+        batch_op.drop_index('ix_timesheet_summary_week')
+        batch_op.drop_index('ix_timesheet_summary_user_week')
+        batch_op.drop_index('ix_timesheet_summary_org_week')
+
+    op.drop_table('timesheet_summary')
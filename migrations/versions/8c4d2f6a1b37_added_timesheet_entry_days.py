@@ -0,0 +1,104 @@
+"""added timesheet entry days
+
+Revision ID: 8c4d2f6a1b37
+Revises: 7b3e9d1c4a58
+Create Date: 2026-10-18 23:02:37.615094
+
+"""
+from datetime import timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c4d2f6a1b37'
+down_revision = '7b3e9d1c4a58'
+branch_labels = None
+depends_on = None
+
+# Entries read and converted per round trip by the backfill
+BACKFILL_BATCH_SIZE = 1000
+
+
+def entryDayRows(entryId, timesheetId, weekStart, timeRecords):
+    """
+    timesheet_entry_days rows of an entry: its days with hours or a note.
+
+    Frozen copy of the application helper as of this revision, where
+    time_records holds the expanded list of day objects.
+    """
+    return [
+        {
+            "entry_id": entryId,
+            "date": weekStart + timedelta(days=day),
+            "timesheet_id": timesheetId,
+            "hours": float(record.get("hours") or 0),
+            "note": record.get("note") or None,
+        }
+        for day, record in enumerate(timeRecords or [])
+        if record.get("hours") or record.get("note")
+    ]
+
+
+def upgrade():
+    days = op.create_table('timesheet_entry_days',
+    sa.Column('entry_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('timesheet_id', sa.Integer(), nullable=False),
+    sa.Column('hours', sa.Float(), nullable=False),
+    sa.Column('note', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['entry_id'], ['timesheet_entries.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['timesheet_id'], ['timesheets.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('entry_id', 'date')
+    )
+    with op.batch_alter_table('timesheet_entry_days', schema=None) as batch_op:
+        batch_op.create_index('ix_timesheet_entry_days_date', ['date', 'timesheet_id'], unique=False)
+        batch_op.create_index('ix_timesheet_entry_days_timesheet', ['timesheet_id'], unique=False)
+
+    # Backfill from time_records in batches of entries (same rows as the
+    # dual write of app.services.timesheet_summary_service at this revision)
+    entries = sa.table('timesheet_entries',
+        sa.column('id', sa.Integer()),
+        sa.column('timesheet_id', sa.Integer()),
+        sa.column('time_records', sa.JSON()),
+    )
+    timesheets = sa.table('timesheets',
+        sa.column('id', sa.Integer()),
+        sa.column('week_start', sa.Date()),
+    )
+    connection = op.get_bind()
+    lastId = 0
+
+    while True:
+        batch = connection.execute(
+            sa.select(
+                entries.c.id,
+                entries.c.timesheet_id,
+                timesheets.c.week_start,
+                entries.c.time_records,
+            )
+            .select_from(entries)
+            .join(timesheets, timesheets.c.id == entries.c.timesheet_id)
+            .where(entries.c.id > lastId)
+            .order_by(entries.c.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).all()
+
+        if not batch:
+            break
+
+        rows = [row for entry in batch for row in entryDayRows(*entry)]
+
+        if rows:
+            op.bulk_insert(days, rows)
+
+        lastId = batch[-1].id
+
+
+def downgrade():
+    with op.batch_alter_table('timesheet_entry_days', schema=None) as batch_op:
+        batch_op.drop_index('ix_timesheet_entry_days_timesheet')
+        batch_op.drop_index('ix_timesheet_entry_days_date')
+
+    op.drop_table('timesheet_entry_days')
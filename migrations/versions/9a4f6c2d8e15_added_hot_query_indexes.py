@@ -0,0 +1,47 @@
+"""added hot query indexes
+
+Revision ID: 9a4f6c2d8e15
+Revises: 5c1e8f3a9d27
+Create Date: 2026-10-18 17:42:03.551904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4f6c2d8e15'
+down_revision = '5c1e8f3a9d27'
+branch_labels = None
+depends_on = None
+
+
+# (table, index name, columns, foreign key column the index also serves or None)
+INDEXES = [
+    ('timesheet_entries', 'ix_timesheet_entries_timesheet_project_status', ['timesheet_id', 'project_id', 'status'], 'timesheet_id'),
+    ('timesheet_entries', 'ix_timesheet_entries_project_timesheet', ['project_id', 'timesheet_id'], 'project_id'),
+    ('timesheets', 'ix_timesheets_week_start_user', ['week_start', 'user_id'], None),
+    ('holidays', 'ix_holidays_org_date', ['org_id', 'date'], 'org_id'),
+    ('timesheet_history', 'ix_timesheet_history_entry', ['timesheet_entry_id'], 'timesheet_entry_id'),
+    ('timesheet_reminders', 'ix_timesheet_reminders_timesheet_type', ['timesheet_id', 'reminder_type'], 'timesheet_id'),
+    ('users', 'ix_users_org_role', ['org_id', 'role_id'], 'org_id'),
+    ('projects', 'ix_projects_manager', ['manager_id'], 'manager_id'),
+    ('user_project', 'ix_user_project_user_project', ['user_id', 'project_id'], 'user_id'),
+]
+
+
+def upgrade():
+    for table, name, columns, _ in INDEXES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.create_index(name, columns, unique=False)
+
+
+def downgrade():
+    for table, name, _, foreignKeyColumn in reversed(INDEXES):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            # MySQL drops its implicit foreign key index once a composite index
+            # covers the column, so put a plain one back before dropping ours
+            if foreignKeyColumn:
+                batch_op.create_index(f'ix_{table}_{foreignKeyColumn}', [foreignKeyColumn], unique=False)
+
+            batch_op.drop_index(name)
@@ -0,0 +1,136 @@
+"""compact time records
+
+Revision ID: 9d5e3a7b2c61
+Revises: 8c4d2f6a1b37
+Create Date: 2026-10-18 23:41:08.204716
+
+"""
+from datetime import timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d5e3a7b2c61'
+down_revision = '8c4d2f6a1b37'
+branch_labels = None
+depends_on = None
+
+# Entries converted per round trip
+CONVERT_BATCH_SIZE = 1000
+
+DAYS_PER_WEEK = 7
+
+
+# Frozen copies of the app.utils.time_records helpers as of this revision:
+# compact format {"h": [7 hours], "n": {"<day index>": note}}, expanded
+# format a list of day objects; the readers accept both.
+
+def weekHours(timeRecords):
+    if isinstance(timeRecords, dict):
+        hours = list(timeRecords.get("h") or [])
+    else:
+        hours = [record.get("hours") for record in timeRecords or []]
+
+    hours += [0] * (DAYS_PER_WEEK - len(hours))
+
+    return [value or 0 for value in hours[:DAYS_PER_WEEK]]
+
+
+def weekNotes(timeRecords):
+    if isinstance(timeRecords, dict):
+        return {int(day): note for day, note in (timeRecords.get("n") or {}).items() if note}
+
+    return {day: record["note"] for day, record in enumerate(timeRecords or []) if record.get("note")}
+
+
+def compactTimeRecords(timeRecords):
+    notes = weekNotes(timeRecords)
+
+    return {
+        "h": weekHours(timeRecords),
+        "n": {str(day): note for day, note in sorted(notes.items()) if note},
+    }
+
+
+entries = sa.table('timesheet_entries',
+    sa.column('id', sa.Integer()),
+    sa.column('timesheet_id', sa.Integer()),
+    sa.column('time_records', sa.JSON()),
+)
+
+
+def _convertEntries(convert, select=None):
+    """
+    Rewrite time_records with convert(row), reading and writing
+    CONVERT_BATCH_SIZE entries per round trip.
+    """
+    connection = op.get_bind()
+    query = select if select is not None else sa.select(entries.c.id, entries.c.time_records)
+    lastId = 0
+
+    while True:
+        batch = connection.execute(
+            query.where(entries.c.id > lastId)
+            .order_by(entries.c.id)
+            .limit(CONVERT_BATCH_SIZE)
+        ).all()
+
+        if not batch:
+            return
+
+        connection.execute(
+            entries.update()
+            .where(entries.c.id == sa.bindparam('entry_id'))
+            .values(time_records=sa.bindparam('records')),
+            [{'entry_id': row.id, 'records': convert(row)} for row in batch],
+        )
+
+        lastId = batch[-1].id
+
+
+def upgrade():
+    _convertEntries(lambda row: compactTimeRecords(row.time_records))
+
+
+def downgrade():
+    timesheets = sa.table('timesheets',
+        sa.column('id', sa.Integer()),
+        sa.column('user_id', sa.Integer()),
+        sa.column('week_start', sa.Date()),
+    )
+    users = sa.table('users',
+        sa.column('id', sa.Integer()),
+        sa.column('org_id', sa.Integer()),
+    )
+    holidays = sa.table('holidays',
+        sa.column('org_id', sa.Integer()),
+        sa.column('date', sa.Date()),
+    )
+    holidayDates = set(op.get_bind().execute(sa.select(holidays.c.org_id, holidays.c.date)).all())
+
+    def expand(row):
+        hours = weekHours(row.time_records)
+        notes = weekNotes(row.time_records)
+        days = [row.week_start + timedelta(days=i) for i in range(len(hours))]
+
+        return [
+            {
+                'date': day.isoformat(),
+                'hours': hours[i],
+                'note': notes.get(i, ''),
+                'is_weekend': day.weekday() >= 5,
+                'is_holiday': (row.org_id, day) in holidayDates,
+                'is_editable': True,
+            }
+            for i, day in enumerate(days)
+        ]
+
+    _convertEntries(
+        expand,
+        sa.select(entries.c.id, entries.c.time_records, timesheets.c.week_start, users.c.org_id)
+        .select_from(entries)
+        .join(timesheets, timesheets.c.id == entries.c.timesheet_id)
+        .join(users, users.c.id == timesheets.c.user_id),
+    )
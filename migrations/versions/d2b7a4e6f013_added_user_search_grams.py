@@ -0,0 +1,70 @@
+"""added user search grams
+
+Revision ID: d2b7a4e6f013
+Revises: 9a4f6c2d8e15
+Create Date: 2026-10-18 18:20:44.130587
+
+"""
+import unicodedata
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2b7a4e6f013'
+down_revision = '9a4f6c2d8e15'
+branch_labels = None
+depends_on = None
+
+
+# Frozen copy of the app.services.search_service gram function as of this
+# revision, so the backfill does not follow later changes to it
+GRAM_SIZE = 3
+
+
+def normalizeSearchText(value):
+    decomposed = unicodedata.normalize("NFKD", value or "")
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+
+
+def textGrams(*values):
+    grams = set()
+
+    for value in values:
+        value = normalizeSearchText(value)
+
+        for size in range(1, GRAM_SIZE + 1):
+            grams.update(value[i:i + size] for i in range(len(value) - size + 1))
+
+    return grams
+
+
+def upgrade():
+    grams = op.create_table('user_search_grams',
+    sa.Column('gram', sa.String(length=3).with_variant(mysql.VARCHAR(length=3, collation='utf8mb4_bin'), 'mysql'), nullable=False),
+    sa.Column('user_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('gram', 'user_id')
+    )
+    with op.batch_alter_table('user_search_grams', schema=None) as batch_op:
+        batch_op.create_index('ix_user_search_grams_user', ['user_id'], unique=False)
+
+    # Backfill (same as `flask rebuild-search-index` at this revision)
+    users = op.get_bind().execute(sa.text('SELECT id, full_name, email FROM users')).all()
+    rows = [
+        {'gram': gram, 'user_id': user.id}
+        for user in users
+        for gram in textGrams(user.full_name, user.email)
+    ]
+
+    if rows:
+        op.bulk_insert(grams, rows)
+
+
+def downgrade():
+    with op.batch_alter_table('user_search_grams', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_search_grams_user')
+
+    op.drop_table('user_search_grams')